@@ -8,10 +8,13 @@ from flasgger import swag_from
 from flask import Blueprint, request, jsonify, abort
 from flask_jwt import jwt_required
 from sqlalchemy import exc
+from sqlalchemy.orm import selectinload
 
 from api.route.static import swagger_param_auth_token
 from api.schema.role import RoleSchema, RoleSchemaInfo
 from core.db import db
+from core.pagination import decode_cursor, encode_cursor
+from core.permission_cache import permission_cache
 from models.db_models import Role, Permission
 from api.route.decorators import user_has, user_is
 from api.route.error_messages import ErrMsgEnum
@@ -19,32 +22,54 @@ from api.route.error_messages import ErrMsgEnum
 
 api_admin_role = Blueprint("admin_role", __name__)
 
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 
 @api_admin_role.route("/")
 @swag_from(
     {
         "tags": ["admin roles"],
         "parameters": [
+            {"in": "query", "name": "name", "description": "Substring of the role name", "type": "string"},
+            {"in": "query", "name": "limit", "description": f"Page size, up to {MAX_PAGE_SIZE}", "type": "integer"},
+            {"in": "query", "name": "cursor", "description": "X-Next-Cursor of the previous page", "type": "string"},
             swagger_param_auth_token,
         ],
         "responses": {
             int(HTTPStatus.OK): {
-                "description": "Get roles",
+                "description": "Get roles ordered by name, cursor of the next page in X-Next-Cursor",
                 "schema": {
                     "id": "RolesList",
                     "type": "array",
                     "items": RoleSchemaInfo,
                 },
-            }
+            },
+            int(HTTPStatus.BAD_REQUEST): {"description": "Bad request", "schema": {"type": "string"}},
         },
     }
 )
 @jwt_required()
 @user_has("all_read")
 def get_roles():
-    roles_data = RoleSchema(many=True).dump(Role.query.all())
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    query = Role.query.options(selectinload(Role.permissions))
+    if name := request.args.get("name"):
+        query = query.filter(Role.name.contains(name, autoescape=True))
+    if cursor := request.args.get("cursor"):
+        try:
+            (last_name,) = decode_cursor(cursor)
+        except ValueError:
+            abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.CURSOR_ERROR)
+        query = query.filter(Role.name > last_name)
+    roles = query.order_by(Role.name).limit(limit + 1).all()
+    headers = {}
+    if len(roles) > limit:
+        roles = roles[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(roles[-1].name)
+    roles_data = RoleSchema(many=True).dump(roles)
     logging.debug("%s", roles_data)
-    return roles_data, HTTPStatus.OK
+    return jsonify(roles_data), HTTPStatus.OK, headers
 
 
 @api_admin_role.route("/<string:id>")
@@ -64,7 +89,7 @@ def get_roles():
 @jwt_required()
 @user_has("all_read")
 def get_role(id):
-    role = Role.query.filter_by(id=id).one()
+    role = Role.query.options(selectinload(Role.permissions)).filter_by(id=id).one()
     logging.debug("%s", role.permissions)
     role_data = RoleSchema().dump(role)
     logging.debug("%s", role_data)
@@ -144,6 +169,7 @@ def update_role(id):
         logging.debug(permission)
         role.permissions.append(Permission(name=permission))
     db.session.commit()
+    permission_cache.invalidate()
     return jsonify(dict(status="success")), HTTPStatus.CREATED
 
 
@@ -177,4 +203,5 @@ def delete_role(id):
         abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_USER)
     db.session.delete(role)
     db.session.commit()
+    permission_cache.invalidate()
     return jsonify(dict(status="success")), HTTPStatus.NO_CONTENT
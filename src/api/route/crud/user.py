@@ -1,17 +1,26 @@
 """User endpoints"""
 
+import json
 import logging
+import shutil
+import tempfile
 import uuid
 from http import HTTPStatus
 
+from avro.datafile import DataFileReader
+from avro.errors import AvroException
+from avro.io import DatumReader
 from flasgger import swag_from
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, Response, request, jsonify, abort, stream_with_context
 from flask_jwt import jwt_required
-from sqlalchemy import exc
+from sqlalchemy import select
 
 from api.route.static import swagger_param_auth_token
 from core.db import db
-from models.db_models import User, Role
+from core.permission_cache import permission_cache
+from core.user_import import UserImporter, avro_rows, ndjson_rows
+from core.user_snapshot import user_snapshot
+from models.db_models import Role, User, association_user_roles
 from api.route.decorators import user_has, user_is
 from api.route.error_messages import ErrMsgEnum
 
@@ -59,24 +68,158 @@ api_admin_user = Blueprint("admin_user", __name__)
 @user_has("all_write")
 def user_role_update(id):
     try:
-        uuid.UUID(id)
-        user = User.query.filter_by(id=id).one()
-    except ValueError:
+        user_id = uuid.UUID(id)
+        role_ids = {uuid.UUID(role_id) for role_id in request.json}
+    except (AttributeError, TypeError, ValueError):
         abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.FORMAT_ERROR)
-    except exc.NoResultFound:
+    if not db.session.query(User.id).filter_by(id=user_id).first():
         abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_USER)
-    logging.debug("%s", user)
-    user.roles = []
+    check_roles(role_ids)
+    set_user_roles({user_id}, role_ids)
+    db.session.commit()
+    permission_cache.invalidate()
+    return jsonify(dict(status="success")), HTTPStatus.CREATED
+
+
+@api_admin_user.route("/roles/", methods=["PUT"])
+@swag_from(
+    {
+        "description": "Set the same list of roles for many users",
+        "tags": ["admin user"],
+        "parameters": [
+            {
+                "description": "users and the list of roles to apply to each of them, identified by uuid",
+                "in": "body",
+                "name": "body",
+                "required": "true",
+                "schema": {
+                    "id": "UsersRoles",
+                    "type": "object",
+                    "properties": {
+                        "users": {"type": "array", "items": {"type": "string", "format": "uuid"}},
+                        "roles": {"type": "array", "items": {"type": "string", "format": "uuid"}},
+                    },
+                },
+            },
+            swagger_param_auth_token,
+        ],
+        "responses": {
+            int(HTTPStatus.CREATED): {
+                "description": "Number of added and removed role assignments",
+            },
+            int(HTTPStatus.BAD_REQUEST): {"description": "Bad request", "schema": {"type": "string"}},
+            int(HTTPStatus.UNAUTHORIZED): {"description": "Unauthorized", "schema": {"type": "string"}},
+            int(HTTPStatus.FORBIDDEN): {"description": "Forbidden", "schema": {"type": "string"}},
+        },
+    }
+)
+@jwt_required()
+@user_has("all_write")
+def users_roles_update():
     try:
-        for role_id in request.json:
-            logging.debug("%s", role_id)
-            uuid.UUID(role_id)
-            role = Role.query.filter_by(id=role_id).one()
-            logging.debug("%s", role)
-            user.roles.append(role)
-    except ValueError:
+        user_ids = {uuid.UUID(user_id) for user_id in request.json["users"]}
+        role_ids = {uuid.UUID(role_id) for role_id in request.json["roles"]}
+    except (AttributeError, KeyError, TypeError, ValueError):
         abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.FORMAT_ERROR)
-    except exc.NoResultFound:
-        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_ROLE)
+    found_users = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    if found_users != user_ids:
+        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_USER)
+    check_roles(role_ids)
+    inserted, deleted = set_user_roles(user_ids, role_ids)
     db.session.commit()
-    return jsonify(dict(status="success")), HTTPStatus.CREATED
+    permission_cache.invalidate()
+    return jsonify(dict(status="success", inserted=inserted, deleted=deleted)), HTTPStatus.CREATED
+
+
+def check_roles(role_ids: set[uuid.UUID]) -> None:
+    """Все роли существуют; проверка одним запросом IN."""
+    found = {role_id for (role_id,) in db.session.query(Role.id).filter(Role.id.in_(role_ids))}
+    if found != role_ids:
+        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_ROLE)
+
+
+def set_user_roles(user_ids: set[uuid.UUID], role_ids: set[uuid.UUID]) -> tuple[int, int]:
+    """Привести роли пользователей к role_ids.
+
+    Текущие назначения читаются одним запросом, лишние удаляются одним
+    DELETE, недостающие добавляются одним INSERT. Возвращает число
+    добавленных и удаленных назначений.
+    """
+    table = association_user_roles
+    existing = set(
+        db.session.execute(select(table.c.users_id, table.c.roles_id).where(table.c.users_id.in_(user_ids)))
+    )
+    missing = [
+        {"users_id": user_id, "roles_id": role_id}
+        for user_id in user_ids
+        for role_id in role_ids
+        if (user_id, role_id) not in existing
+    ]
+    deleted = 0
+    if any(role_id not in role_ids for _, role_id in existing):
+        deleted = db.session.execute(
+            table.delete().where(table.c.users_id.in_(user_ids), table.c.roles_id.not_in(role_ids))
+        ).rowcount
+    if missing:
+        db.session.execute(table.insert(), missing)
+    return len(missing), deleted
+
+
+@api_admin_user.route("/import", methods=["POST"])
+@swag_from(
+    {
+        "description": "Bulk import of users",
+        "tags": ["admin user"],
+        "consumes": ["application/x-ndjson", "avro/binary"],
+        "parameters": [
+            {
+                "description": "NDJSON objects {login, password | password_hash, email, id, roles} "
+                "or Avro file in the users export schema",
+                "in": "body",
+                "name": "body",
+                "required": "true",
+                "schema": {"type": "string", "format": "binary"},
+            },
+            swagger_param_auth_token,
+        ],
+        "responses": {
+            int(HTTPStatus.OK): {
+                "description": "NDJSON stream of row errors, progress after each batch and the final totals",
+            },
+            int(HTTPStatus.BAD_REQUEST): {"description": "Bad request", "schema": {"type": "string"}},
+            int(HTTPStatus.UNAUTHORIZED): {"description": "Unauthorized", "schema": {"type": "string"}},
+            int(HTTPStatus.FORBIDDEN): {"description": "Forbidden", "schema": {"type": "string"}},
+        },
+    }
+)
+@jwt_required()
+@user_has("all_write")
+def user_import():
+    if request.mimetype == "application/x-ndjson":
+        rows = ndjson_rows(request.stream)
+    elif request.mimetype in ("avro/binary", "application/avro"):
+        # DataFileReader читает заголовок с seek, поэтому тело копируется в буфер
+        body = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        shutil.copyfileobj(request.stream, body)
+        body.seek(0)
+        try:
+            rows = avro_rows(DataFileReader(body, DatumReader()))
+        except AvroException:
+            abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.IMPORT_FORMAT_ERROR)
+    else:
+        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.CONTENT_NOT_SUPPORTED)
+    importer = UserImporter({role.name: role.id for role in Role.query.all()})
+
+    def generate():
+        try:
+            for event in importer.run(rows):
+                yield json.dumps(event) + "\n"
+        except Exception:
+            # Статус 200 уже отправлен: сбой сообщается последней строкой, загруженные пачки остаются
+            logging.exception("User import failed")
+            db.session.rollback()
+            yield json.dumps({"error": ErrMsgEnum.IMPORT_ERROR, **importer.totals}) + "\n"
+        finally:
+            user_snapshot.invalidate()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
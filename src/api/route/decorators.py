@@ -6,11 +6,12 @@ from http import HTTPStatus
 from flask_jwt import current_identity
 from flask import abort, request
 
+from core.permission_cache import permission_cache
+from core.principal import TokenPrincipal
 from core.settings import settings
 from rate_limiter.limiter import Limiter
-from rate_limiter.redis_bucket import RedisBucket
+from rate_limiter.lease_bucket import LeaseBucket
 
-from models.db_models import Permission
 from opentelemetry import trace
 from core.tracer import tracer
 import inspect
@@ -47,15 +48,15 @@ def user_has(permission, get_user=login_user):
     def wrapper(func):
         @wraps(func)
         def inner(*args, **kwargs):
-            acceptable_permissions = Permission.query.filter_by(name=permission).first()
-            user_permissions = []
             current_user = get_user()
-            for role in current_user.roles:
-                user_permissions += role.permissions
-            if acceptable_permissions in user_permissions:
-                return func(*args, **kwargs)
+            if isinstance(current_user, TokenPrincipal):
+                user_permissions = permission_cache.role_name_permissions(current_user.role_names)
             else:
-                abort(HTTPStatus.FORBIDDEN, description="You do not have access")
+                user_permissions = permission_cache.role_permissions(role.id for role in current_user.roles)
+            if permission in user_permissions:
+                return func(*args, **kwargs)
+            abort(HTTPStatus.FORBIDDEN, description="You do not have access")
+
         return inner
 
     return wrapper
@@ -121,14 +122,17 @@ def rate_limit(reqs_in_sec, get_user=login_user):
             if settings.disable_limiter:
                 return func(*args, **kwargs)
             if not (limiter := rates.get(reqs_in_sec)):
-                limiter = Limiter[RedisBucket](reqs_in_sec)
+                limiter = Limiter[LeaseBucket](
+                    reqs_in_sec,
+                    bucket_kwargs={"tolerance": settings.limiter_tolerance, "min_lease": settings.limiter_min_lease},
+                )
                 rates[reqs_in_sec] = limiter
 
+            # Корзина - по id пользователя: объект пользователя создается заново на каждый запрос
             current_user = get_user()
-            if not current_user:
-                current_user = "Anonymous"
+            identity = str(current_user.id) if current_user else "anonymous"
 
-            with limiter.ratelimit(current_user, delay=False):
+            with limiter.ratelimit(identity, delay=False):
                 return func(*args, **kwargs)
 
         return inner
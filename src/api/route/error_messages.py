@@ -14,3 +14,7 @@ class ErrMsgEnum(str, Enum):
     FORMAT_ERROR = "Incorrect format ID"
     MISSING_USER = "Missing user"
     MISSING_ROLE = "Missing role"
+    CURSOR_ERROR = "Incorrect cursor"
+    IMPORT_FORMAT_ERROR = "Incorrect import file"
+    IMPORT_ERROR = "Import interrupted"
+    TOKENS_ERROR = "Expected a list of tokens"
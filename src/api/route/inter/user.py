@@ -1,33 +1,129 @@
+import hashlib
+import itertools
 from http import HTTPStatus
 
-from avro.datafile import DataFileWriter
-from avro.io import DatumWriter
+from avro.codecs import KNOWN_CODECS
 from avro.schema import make_avsc_object
 from flasgger import swag_from
-from flask import send_from_directory, Blueprint
+from flask import Blueprint, Response, abort, request, stream_with_context
+from sqlalchemy import func
 
 from avro_schemes.user_avro_scheme import user as user_avro_scheme
+from core.avro_stream import stream_avro
+from core.db import db
+from core.user_snapshot import user_snapshot
 from core.settings import settings
-from models.db_models import User
+from models.db_models import DeletedUser, User
 
 inter_user = Blueprint("inter_user", __name__)
 
+parsed_schema = make_avsc_object(user_avro_scheme)
+
+# Маркер снимка выводится из схемы: ETag (хеш файла) зависит только от записей
+SNAPSHOT_SYNC_MARKER = hashlib.sha256(str(parsed_schema).encode("utf-8")).digest()[:16]
+
+
+def watermark() -> int:
+    """Граница выгрузки: xmin снимка.
+
+    Транзакции с меньшим номером завершены, и их изменения уже не появятся;
+    изменения остальных попадут в следующую выгрузку. Выгрузка с since
+    берет изменения транзакций от since до новой границы.
+    """
+    return db.session.query(func.txid_snapshot_xmin(func.txid_current_snapshot())).scalar()
+
+
+def user_records(since: int = None, until: int = None):
+    query = db.session.query(User.login, User.id, User.email)
+    if since is not None:
+        query = query.filter(User.change_xid >= since, User.change_xid < until)
+    else:
+        query = query.order_by(User.id)
+    for login, pk, email in query.yield_per(settings.avro_batch_size):
+        yield {"name": login, "pk": str(pk), "email": email if email else "", "deleted": False}
+
+
+def deleted_records(since: int, until: int):
+    query = db.session.query(DeletedUser.login, DeletedUser.id).filter(
+        DeletedUser.change_xid >= since, DeletedUser.change_xid < until
+    )
+    for login, pk in query.yield_per(settings.avro_batch_size):
+        yield {"name": login, "pk": str(pk), "email": "", "deleted": True}
+
+
+def request_codec() -> str:
+    codec = request.args.get("codec", settings.avro_codec)
+    if codec not in KNOWN_CODECS:
+        abort(HTTPStatus.BAD_REQUEST, description=f"Codec must be one of: {', '.join(KNOWN_CODECS)}")
+    return codec
+
+
+def avro_response(records, until: int) -> Response:
+    return Response(
+        stream_with_context(stream_avro(parsed_schema, records, request_codec())),
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": "attachment; filename=users.avro", "X-Export-Watermark": str(until)},
+    )
+
 
 @inter_user.route("/", methods=["GET"])
 @swag_from(
     {
         "tags": ["interraction"],
+        "parameters": [
+            {"in": "query", "name": "codec", "description": "Avro codec", "type": "string", "enum": list(KNOWN_CODECS)},
+            {"in": "header", "name": "If-None-Match", "description": "ETag of the cached snapshot", "type": "string"},
+        ],
         "responses": {
             int(HTTPStatus.OK): {"description": "Get roles", "schema": {"type": "file"}},
+            int(HTTPStatus.NOT_MODIFIED): {"description": "Snapshot not modified"},
             int(HTTPStatus.BAD_REQUEST): {"description": "Bad request", "schema": {"type": "string"}},
         },
     }
 )
 def user_avro():
-    parsed_schema = make_avsc_object(user_avro_scheme)
-    scheme_file = settings.avro_path.joinpath("users.avro_schemes")
-    writer = DataFileWriter(open(scheme_file, "wb"), DatumWriter(), parsed_schema)
-    for user in User.query.all():
-        writer.append({"name": user.login, "pk": str(user.id), "email": user.email if user.email else ""})
-    writer.close()
-    return send_from_directory(settings.avro_path, "users.avro_schemes")
+    codec = request_codec()
+    if settings.avro_snapshot_ttl <= 0:
+        return avro_response(user_records(), watermark())
+    meta = user_snapshot.meta(codec)
+    if meta is not None and request.if_none_match.contains(meta["etag"]):
+        response = Response(status=HTTPStatus.NOT_MODIFIED)
+    else:
+        meta, blob = user_snapshot.get(
+            codec, watermark, lambda: stream_avro(parsed_schema, user_records(), codec, SNAPSHOT_SYNC_MARKER)
+        )
+        response = Response(
+            blob, mimetype="application/octet-stream", headers={"Content-Disposition": "attachment; filename=users.avro"}
+        )
+    response.set_etag(meta["etag"])
+    response.headers["X-Export-Watermark"] = meta["watermark"]
+    return response
+
+
+@inter_user.route("/changes", methods=["GET"])
+@swag_from(
+    {
+        "tags": ["interraction"],
+        "parameters": [
+            {"in": "query", "name": "since", "description": "X-Export-Watermark of the previous export", "type": "integer"},
+            {"in": "query", "name": "codec", "description": "Avro codec", "type": "string", "enum": list(KNOWN_CODECS)},
+        ],
+        "responses": {
+            int(HTTPStatus.OK): {
+                "description": "Users changed or deleted after the watermark, new watermark in X-Export-Watermark",
+                "schema": {"type": "file"},
+            },
+            int(HTTPStatus.BAD_REQUEST): {"description": "Bad request", "schema": {"type": "string"}},
+        },
+    }
+)
+def user_avro_changes():
+    """Пользователи, измененные или удаленные после since.
+
+    Верхняя граница выборки фиксируется до начала выгрузки и возвращается
+    в X-Export-Watermark; следующий запрос передает ее в since.
+    """
+    since = request.args.get("since", 0, type=int)
+    until = watermark()
+    records = itertools.chain(user_records(since, until), deleted_records(since, until))
+    return avro_response(records, until)
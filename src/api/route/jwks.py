@@ -0,0 +1,38 @@
+"""JWKS endpoint"""
+
+import hashlib
+import json
+from http import HTTPStatus
+
+from flasgger import swag_from
+from flask import Blueprint, Response, request
+
+from core.settings import settings
+from core.tokens import tokens
+
+jwks_api = Blueprint("jwks", __name__)
+
+
+@jwks_api.route("/jwks.json", methods=["GET"])
+@swag_from(
+    {
+        "tags": ["interraction"],
+        "responses": {
+            int(HTTPStatus.OK): {"description": "Public keys for offline token verification", "schema": {"type": "object"}},
+            int(HTTPStatus.NOT_MODIFIED): {"description": "Keys not modified"},
+        },
+    }
+)
+def get_jwks():
+    """Открытые ключи подписи токенов (RFC 7517).
+
+    Ответ кэшируется клиентами на settings.app.jwks_max_age секунд, поэтому
+    новый ключ добавляется в каталог ключей не позже чем за это время до
+    переключения на него jwt_kid.
+    """
+    body = json.dumps(tokens.jwks(), separators=(",", ":"))
+    response = Response(body, mimetype="application/json")
+    response.set_etag(hashlib.sha256(body.encode("utf-8")).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = settings.app.jwks_max_age
+    return response.make_conditional(request)
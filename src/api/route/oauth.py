@@ -1,6 +1,5 @@
 """OAuth endpoints"""
 
-import datetime
 from http import HTTPStatus
 
 from flask import jsonify, redirect, request, url_for
@@ -11,10 +10,13 @@ from flask_login import current_user, login_user
 from sqlalchemy.orm.exc import NoResultFound
 
 from core.db import db
+from core.history_writer import history_writer
 from core.redis import redis
+from core.sessions import sessions
 from core.settings import settings
+from core.tokens import tokens
+from core.user_snapshot import user_snapshot
 from models.db_models import OAuth, User
-from models.login_history import Login
 
 google_blueprint = make_google_blueprint(
     client_id=settings.oauth.google_client_id,
@@ -31,8 +33,6 @@ google_blueprint = make_google_blueprint(
     ),
 )
 
-CACHE_EXPIRE_IN_SECONDS = 60 * 60 * 24 * 7
-
 
 # create/login local user on successful OAuth login
 @oauth_authorized.connect_via(google_blueprint)
@@ -74,6 +74,8 @@ def google_logged_in(blueprint, token):
                 oauth.user = new_user
                 db.session.add_all([new_user, oauth])
             db.session.commit()
+            if not user:
+                user_snapshot.invalidate()
         # Log in the new local user account
         user = User.query.filter_by(login=local_user).first()
         login_user(user)
@@ -86,30 +88,11 @@ def index():
     if not google.authorized:
         return redirect(url_for("google.login"))
     user = current_user
-    access_token = User.encode_auth_token(user.id, None, datetime.timedelta(days=0, minutes=10))
-    refresh_token = User.encode_auth_token(user.id, None, datetime.timedelta(days=7))
-    ret = {
-        "access_token": access_token.decode("utf-8"),
-        "refresh_token": refresh_token.decode("utf-8"),
-    }
+    pipeline = redis.pipeline()
+    sid = sessions.create(user.id, pipeline)
+    ret = tokens.issue_pair(user.id, None, login=user.login, sid=sid)
     user_agent = request.headers["User-Agent"]
-    user.signin.append(
-                Login(
-                    login=user.login,
-                    dt=datetime.datetime.utcnow(),
-                    ip=request.remote_addr,
-                    raw_user_agent=user_agent,
-                )
-            )
+    history_writer.record(user.id, user.login, request.remote_addr, user_agent, pipeline)
     db.session.commit()
-    redis.set(
-        f"refresh_token:{user.id}:{user_agent}",
-        refresh_token.decode("utf-8"),
-        ex=CACHE_EXPIRE_IN_SECONDS,
-    )
-    redis.set(
-        refresh_token.decode("utf-8"),
-        f"{user.id}::{user.roles}",
-        ex=CACHE_EXPIRE_IN_SECONDS,
-    )
+    pipeline.execute()
     return jsonify(ret), HTTPStatus.CREATED
@@ -3,17 +3,27 @@
 import datetime
 import logging
 import time
+import uuid
 from http import HTTPStatus
 
+import jwt
 from flasgger import swag_from
-from flask import Blueprint, abort, jsonify, request
+from flask import Blueprint, abort, g, jsonify, request
 from flask_jwt import current_identity, jwt_required
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
 
-from api.schema.login import LoginsSchema
+from api.schema.login import LoginsPageSchema, LoginsSchema
 from api.schema.signin import SignInSchema
 from api.schema.user import UserSchema
 from core.db import db
+from core.denylist import token_denylist
+from core.history_writer import history_writer
+from core.pagination import decode_cursor, encode_cursor
 from core.redis import redis
+from core.sessions import sessions
+from core.tokens import ACCESS_TOKEN_TTL, REFRESH_TOKEN, tokens
+from core.user_snapshot import user_snapshot
 from models.db_models import User
 from models.login_history import Login
 
@@ -24,8 +34,8 @@ from api.route.decorators import rate_limit, Trac
 
 users_api = Blueprint("users", __name__)
 
-CACHE_EXPIRE_IN_SECONDS = 60 * 60 * 24 * 7
 PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
 
 @users_api.route("/register", methods=["POST"])
 @swag_from(
@@ -48,46 +58,22 @@ def register():
     content_type = request.headers.get("Content-Type")
     if content_type == "application/json":
         login = request.json["login"]
-        user = User.query.filter_by(login=login).first()
-        if user and login == user.login:
-            abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.LOGIN_EXISTS)
         password = request.json["password"]
         if len(password) < 6:
             abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.PASSWORD_ERROR)
-        user = User(login=login, plain_password=password)
-        db.session.add(user)
-        db.session.commit()
-        new_user = User.query.filter_by(login=login).first()
-        access_token = User.encode_auth_token(new_user.id, None, datetime.timedelta(days=0, minutes=10))
-        refresh_token = User.encode_auth_token(new_user.id, None, datetime.timedelta(days=7))
-        ret = {
-            "access_token": access_token.decode("utf-8"),
-            "refresh_token": refresh_token.decode("utf-8"),
-        }
+        if not (user_id := User.create_if_absent(login, password)):
+            db.session.rollback()
+            abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.LOGIN_EXISTS)
+        pipeline = redis.pipeline()
+        user_snapshot.invalidate(pipeline)
+        sid = sessions.create(user_id, pipeline)
+        ret = tokens.issue_pair(user_id, None, login=login, sid=sid)
 
         user_agent = request.headers["User-Agent"]
 
-        user.signin.append(
-            Login(
-                login=login,
-                dt=datetime.datetime.utcnow(),
-                ip=request.remote_addr,
-                raw_user_agent=user_agent,
-            )
-        )
+        history_writer.record(user_id, login, request.remote_addr, user_agent, pipeline)
         db.session.commit()
-
-        redis.set(
-            f"refresh_token:{new_user.id}:{user_agent}",
-            refresh_token.decode("utf-8"),
-            ex=CACHE_EXPIRE_IN_SECONDS,
-        )
-
-        redis.set(
-            refresh_token.decode("utf-8"),
-            f"{new_user.id}::{new_user.roles}",
-            ex=CACHE_EXPIRE_IN_SECONDS,
-        )
+        pipeline.execute()
 
         return jsonify(ret), HTTPStatus.CREATED
     abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.CONTENT_NOT_SUPPORTED)
@@ -122,36 +108,15 @@ def login():
         else:
             if user.check_password(password):
                 role = ",".join([role.name for role in user.roles])
-                access_token = User.encode_auth_token(user.id, role, datetime.timedelta(days=0, minutes=10))
-                refresh_token = User.encode_auth_token(user.id, role, datetime.timedelta(days=7))
-                ret = {
-                    "access_token": access_token.decode("utf-8"),
-                    "refresh_token": refresh_token.decode("utf-8"),
-                }
+                pipeline = redis.pipeline()
+                sid = sessions.create(user.id, pipeline)
+                ret = tokens.issue_pair(user.id, role, login=login, sid=sid)
 
                 user_agent = request.headers["User-Agent"]
                 logging.info(user_agent)
-                user.signin.append(
-                    Login(
-                        login=login,
-                        dt=datetime.datetime.utcnow(),
-                        ip=request.remote_addr,
-                        raw_user_agent=user_agent,
-                    )
-                )
+                history_writer.record(user.id, login, request.remote_addr, user_agent, pipeline)
                 db.session.commit()
-
-                redis.set(
-                    f"refresh_token:{user.id}:{user_agent}",
-                    refresh_token.decode("utf-8"),
-                    ex=CACHE_EXPIRE_IN_SECONDS,
-                )
-
-                redis.set(
-                    refresh_token.decode("utf-8"),
-                    f"{user.id}::{user.roles}",
-                    ex=CACHE_EXPIRE_IN_SECONDS,
-                )
+                pipeline.execute()
 
                 return jsonify(ret), HTTPStatus.CREATED
             else:
@@ -186,10 +151,11 @@ def login():
 )
 @jwt_required()
 def logout():
-    key = f"refresh_token:{current_identity.id}:{request.headers['User-Agent']}"
-    refresh_token = redis.get(key)
-    redis.delete(key)
-    redis.delete(refresh_token)
+    pipeline = redis.pipeline()
+    if sid := g.jwt_payload.get("sid"):
+        sessions.revoke(current_identity.id, sid, pipeline)
+    token_denylist.deny(g.jwt_payload, pipeline)
+    pipeline.execute()
     return jsonify(dict(status="success")), HTTPStatus.CREATED
 
 
@@ -220,16 +186,12 @@ def logout():
 )
 @jwt_required()
 def logout_all():
-    logins = Login.query.filter_by(login=current_identity.login).all()
-    used = set()
-    unique_agents = [
-        login.user_agent for login in logins if login.user_agent not in used and (used.add(login.user_agent) or True)
-    ]
-    for agent in unique_agents:
-        key = f"refresh_token:{current_identity.id}:{agent}"
-        refresh_token = redis.get(key)
-        redis.delete(key)
-        redis.delete(refresh_token)
+    sids = sessions.sids(current_identity.id)
+    pipeline = redis.pipeline()
+    token_denylist.deny(g.jwt_payload, pipeline)
+    token_denylist.deny_sessions(sids, pipeline)
+    sessions.revoke_all(current_identity.id, pipeline)
+    pipeline.execute()
     return jsonify(dict(status="success")), HTTPStatus.CREATED
 
 
@@ -310,6 +272,61 @@ def login_history(page: int):
     return LoginsSchema().dump(dict(logins=page.object_list)), HTTPStatus.OK
 
 
+@users_api.route("/history", methods=["GET"])
+@swag_from(
+    {
+        "tags": ["users"],
+        "parameters": [
+            {
+                "in": "header",
+                "name": "Authorization",
+                "required": "true",
+                "description": "JWT token",
+                "schema": {"type": "string"},
+            },
+            {"in": "query", "name": "cursor", "description": "next_cursor of the previous page", "type": "string"},
+            {"in": "query", "name": "limit", "description": f"Page size, up to {MAX_PAGE_SIZE}", "type": "integer"},
+            {"in": "query", "name": "count", "description": "Return total number of logins", "type": "boolean"},
+        ],
+        "responses": {
+            int(HTTPStatus.OK): {
+                "description": "Login history, newest first",
+                "schema": LoginsPageSchema,
+            },
+            int(HTTPStatus.BAD_REQUEST): {
+                "description": "Bad request",
+                "schema": {"type": "string"},
+            },
+            int(HTTPStatus.UNAUTHORIZED): {
+                "description": "Unauthorized",
+                "schema": {"type": "string"},
+            },
+        },
+    }
+)
+@jwt_required()
+def login_history_cursor():
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    query = Login.query.filter_by(login=current_identity.login)
+    ret = {}
+    if request.args.get("count", "false").lower() == "true":
+        ret["total"] = query.count()
+    if cursor := request.args.get("cursor"):
+        try:
+            dt, login_id = decode_cursor(cursor)
+            key = (datetime.datetime.fromisoformat(dt), uuid.UUID(login_id))
+        except ValueError:
+            abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.CURSOR_ERROR)
+        query = query.filter(tuple_(Login.dt, Login.id) < key)
+    logins = query.order_by(Login.dt.desc(), Login.id.desc()).limit(limit + 1).all()
+    ret["next_cursor"] = None
+    if len(logins) > limit:
+        logins = logins[:limit]
+        ret["next_cursor"] = encode_cursor(logins[-1].dt.isoformat(), logins[-1].id.hex)
+    ret["logins"] = logins
+    return LoginsPageSchema().dump(ret), HTTPStatus.OK
+
+
 @users_api.route("/refresh", methods=["POST"])
 @swag_from(
     {
@@ -336,17 +353,20 @@ def login_history(page: int):
     }
 )
 def refresh():
-    user = redis.get(request.data.decode("utf-8"))
-    if user:
-        user_parts = user.decode("utf-8").split("::")
-        access_token = User.encode_auth_token(
-            user_parts[0],
-            user_parts[1],
-            datetime.timedelta(days=0, minutes=10),
-        )
-        return jsonify(dict(access_token=access_token.decode("utf-8"))), HTTPStatus.OK
-    else:
+    token = request.data.decode("utf-8")
+    try:
+        claims = tokens.decode(token, REFRESH_TOKEN)
+    except jwt.InvalidTokenError:
+        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.NO_REFRESH_TOKEN)
+    user_id = claims["sub"].strip('"')
+    if "sid" not in claims or not sessions.exists(user_id, claims["sid"]):
         abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.NO_REFRESH_TOKEN)
+    # Роли перечитываются: изменение ролей видно в следующем access-токене
+    if not (user := User.query.options(joinedload(User.roles)).filter_by(id=user_id).first()):
+        abort(HTTPStatus.BAD_REQUEST, description=ErrMsgEnum.MISSING_USER)
+    role = ",".join(role.name for role in user.roles)
+    access_token = tokens.issue(user.id, role, ACCESS_TOKEN_TTL, login=user.login, sid=claims.get("sid"))
+    return jsonify(dict(access_token=access_token)), HTTPStatus.OK
 
 
 @users_api.route("/test", methods=["GET"])
@@ -23,3 +23,12 @@ class LoginsSchema(Schema):
         fields = ["logins"]
 
     logins = fields.Nested(LoginSchema, many=True)
+
+
+class LoginsPageSchema(Schema):
+    class Meta:
+        fields = ["logins", "next_cursor", "total"]
+
+    logins = fields.Nested(LoginSchema, many=True)
+    next_cursor = fields.Str(description="Cursor of the next page", allow_none=True)
+    total = fields.Int(description="Total number of logins")
@@ -13,11 +13,15 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExport
 from werkzeug.exceptions import HTTPException
 
 from api.route.crud import api_admin_permission, api_admin_role, api_admin_user
+from api.route.inter.token import inter_token
 from api.route.inter.user import inter_user
+from api.route.jwks import jwks_api
 from api.route.oauth import google_blueprint
 from api.route.users import users_api
 from core.db import db
-from core.login_manager import authenticate, identity, login_manager
+from core.denylist import token_denylist
+from core.history_writer import history_writer
+from core.login_manager import authenticate, decode_token, identity, login_manager
 from core.redis import redis
 from core.settings import AppSettings, settings
 
@@ -55,6 +59,8 @@ app.register_blueprint(api_admin_user, url_prefix="/api/admin/user")
 app.register_blueprint(api_admin_role, url_prefix="/api/admin/role")
 app.register_blueprint(api_admin_permission, url_prefix="/api/admin/permission")
 app.register_blueprint(inter_user, url_prefix="/api/inter/user")
+app.register_blueprint(inter_token, url_prefix="/api/inter/token")
+app.register_blueprint(jwks_api, url_prefix="/.well-known")
 
 
 @app.errorhandler(HTTPException)
@@ -84,8 +90,11 @@ def before_request():
 
 db.init_app(app)
 redis.init_app(app)
+history_writer.init_app(app)
+token_denylist.init_app(app)
 
 jwt = JWT(app, authenticate, identity)
+jwt.jwt_decode_handler(decode_token)
 login_manager.init_app(app)
 
 
@@ -7,5 +7,6 @@ user = {
         {"name": "pk", "type": "string", "doc": "Идентификатор", "logicalType": "uuid"},
         {"name": "name", "type": "string", "doc": "Имя"},
         {"name": "email", "type": "string", "doc": "Электронная почта"},
+        {"name": "deleted", "type": "boolean", "doc": "Пользователь удален", "default": False},
     ],
 }
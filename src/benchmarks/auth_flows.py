@@ -0,0 +1,138 @@
+"""Нагрузочный тест сценария аутентификации.
+
+Каждый виртуальный пользователь в цикле проходит сценарий
+register -> login -> refresh -> history -> logout-all на gevent WSGIServer,
+как в pywsgi.py. Результат - JSON с пропускной способностью, перцентилями
+задержки, числом SQL-запросов и отправок в Redis на запрос по каждому
+эндпоинту; его можно сохранить и сравнить между коммитами.
+Запуск из каталога src при доступных Postgres и Redis:
+
+    python -m benchmarks.auth_flows --users 20 --duration 30 --output auth_flows.json
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import psycogreen.gevent
+
+psycogreen.gevent.patch_psycopg()
+
+import argparse
+import json
+import platform
+import secrets
+import subprocess
+from collections import defaultdict
+from time import perf_counter
+
+from app import app
+from benchmarks.common import CallCounter, Client, latency_summary, run_for, start_server
+from core.db import db
+from core.settings import settings
+
+# Шаги сценария: название, эндпоинт Flask
+STEPS = (
+    ("register", "users.register"),
+    ("login", "users.login"),
+    ("refresh", "users.refresh"),
+    ("history", "users.login_history_cursor"),
+    ("logout_all", "users.logout_all"),
+)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="число одновременных виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность в секундах")
+    parser.add_argument("--iterations", type=int, default=settings.app.psw_hash_iterations)
+    parser.add_argument("--executor", choices=["inline", "thread"], default=settings.app.hash_executor)
+    parser.add_argument("--output", help="файл для результата в JSON, по умолчанию stdout")
+    args = parser.parse_args()
+
+    settings.app.hash_executor = args.executor
+    settings.app.psw_hash_iterations = args.iterations
+
+    with app.app_context():
+        counter = CallCounter(db.engine)
+    server, port = start_server(app)
+    prefix = f"bench-{secrets.token_hex(4)}"
+    password = secrets.token_hex(8)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    flows = 0
+
+    def step(client, name, method, url, body=None, headers=None, expected=(200, 201)):
+        status, data, latency = client.request(method, url, body, headers)
+        latencies[name].append(latency)
+        if status not in expected:
+            errors[name] += 1
+            return None
+        return json.loads(data)
+
+    def user_loop(number):
+        nonlocal flows
+        client = Client(port)
+        sequence = 0
+        while True:
+            sequence += 1
+            credentials = {"login": f"{prefix}-{number}-{sequence}", "password": password}
+            if step(client, "register", "POST", "/api/users/register", credentials) is None:
+                continue
+            tokens = step(client, "login", "POST", "/api/users/login", credentials)
+            if tokens is None:
+                continue
+            headers = {"Authorization": f"JWT {tokens['access_token']}"}
+            step(client, "refresh", "POST", "/api/users/refresh", tokens["refresh_token"])
+            step(client, "history", "GET", "/api/users/history?limit=10", headers=headers)
+            step(client, "logout_all", "POST", "/api/users/logout-all", headers=headers)
+            flows += 1
+
+    start = perf_counter()
+    run_for(args.duration, *[lambda number=number: user_loop(number) for number in range(args.users)])
+    elapsed = perf_counter() - start
+    server.stop()
+
+    endpoints = {}
+    for name, endpoint in STEPS:
+        requests = len(latencies[name])
+        endpoints[name] = {
+            "requests_per_sec": requests / elapsed,
+            "errors": errors[name],
+            "sql_per_request": counter.queries[endpoint] / requests if requests else 0.0,
+            "redis_per_request": counter.redis[endpoint] / requests if requests else 0.0,
+            **latency_summary(latencies[name]),
+        }
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "duration": args.duration,
+            "iterations": args.iterations,
+            "executor": args.executor,
+            "password_scheme": settings.app.password_scheme,
+        },
+        "flows_per_sec": flows / elapsed,
+        "requests_per_sec": sum(len(values) for values in latencies.values()) / elapsed,
+        "endpoints": endpoints,
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
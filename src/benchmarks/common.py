@@ -0,0 +1,94 @@
+"""Общие инструменты бенчмарков.
+
+Модули бенчмарков запускаются из каталога src после monkey.patch_all(),
+как pywsgi.py, например: python -m benchmarks.login_flood
+"""
+
+import http.client
+import json
+import math
+from collections import Counter
+from time import perf_counter
+
+import gevent
+from flask import has_request_context, request
+from gevent.pywsgi import WSGIServer
+from redis.connection import Connection
+from sqlalchemy import event
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль q (0..100) методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values: list[float]) -> dict[str, float]:
+    """Сводка задержек в миллисекундах."""
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+def start_server(app) -> tuple[WSGIServer, int]:
+    """Запуск приложения на gevent WSGIServer на свободном порту."""
+    server = WSGIServer(("127.0.0.1", 0), app, log=None)
+    server.start()
+    return server, server.server_port
+
+
+class CallCounter:
+    """Число SQL-запросов и отправок в Redis по эндпоинтам Flask.
+
+    Учитываются только вызовы из обработчиков запросов: фоновые потоки
+    (запись истории входов) не попадают в счетчики.
+    """
+
+    def __init__(self, engine):
+        self.queries = Counter()
+        self.redis = Counter()
+        event.listen(engine, "before_cursor_execute", self._on_query)
+        send_packed_command = Connection.send_packed_command
+
+        def counted(connection, command, *args, **kwargs):
+            if has_request_context():
+                self.redis[request.endpoint] += 1
+            return send_packed_command(connection, command, *args, **kwargs)
+
+        Connection.send_packed_command = counted
+
+    def _on_query(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            self.queries[request.endpoint] += 1
+
+
+class Client:
+    """HTTP-клиент с keep-alive соединением."""
+
+    def __init__(self, port: int):
+        self._conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def request(self, method: str, url: str, body=None, headers: dict = None) -> tuple[int, bytes, float]:
+        """Запрос; возвращает статус, тело ответа и задержку в секундах."""
+        headers = {"X-Request-Id": "benchmark", "User-Agent": "benchmark", **(headers or {})}
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        start = perf_counter()
+        self._conn.request(method, url, body=body, headers=headers)
+        response = self._conn.getresponse()
+        data = response.read()
+        return response.status, data, perf_counter() - start
+
+
+def run_for(duration: float, *loops) -> None:
+    """Запуск функций-нагрузчиков в гринлетах на duration секунд."""
+    greenlets = [gevent.spawn(loop) for loop in loops]
+    gevent.sleep(duration)
+    gevent.killall(greenlets)
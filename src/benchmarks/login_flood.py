@@ -0,0 +1,79 @@
+"""Задержка обычных запросов во время потока логинов.
+
+Запуск из каталога src при доступных Postgres и Redis:
+
+    python -m benchmarks.login_flood --logins 20 --duration 10 --executor inline
+    python -m benchmarks.login_flood --logins 20 --duration 10 --executor thread
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import psycogreen.gevent
+
+psycogreen.gevent.patch_psycopg()
+
+import argparse
+import json
+import secrets
+
+from app import app
+from benchmarks.common import Client, latency_summary, run_for, start_server
+from core.settings import settings
+
+PROBE_URL = "/api/admin/permission/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20, help="число клиентов, непрерывно выполняющих логин")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность в секундах")
+    parser.add_argument("--executor", choices=["inline", "thread"], default=settings.app.hash_executor)
+    parser.add_argument("--iterations", type=int, default=settings.app.psw_hash_iterations)
+    args = parser.parse_args()
+
+    settings.app.hash_executor = args.executor
+    settings.app.psw_hash_iterations = args.iterations
+
+    server, port = start_server(app)
+    login = f"bench-{secrets.token_hex(4)}"
+    password = secrets.token_hex(8)
+    status, data, _ = Client(port).request("POST", "/api/users/register", {"login": login, "password": password})
+    if status != 201:
+        raise SystemExit(f"register failed: {status} {data!r}")
+    access_token = json.loads(data)["access_token"]
+
+    login_latencies, probe_latencies = [], []
+
+    def login_loop():
+        client = Client(port)
+        while True:
+            _, _, latency = client.request("POST", "/api/users/login", {"login": login, "password": password})
+            login_latencies.append(latency)
+
+    def probe_loop():
+        client = Client(port)
+        while True:
+            _, _, latency = client.request("GET", PROBE_URL, headers={"Authorization": f"JWT {access_token}"})
+            probe_latencies.append(latency)
+
+    run_for(args.duration, probe_loop, *[login_loop] * args.logins)
+    server.stop()
+
+    print(
+        json.dumps(
+            {
+                "executor": args.executor,
+                "iterations": args.iterations,
+                "logins_per_sec": len(login_latencies) / args.duration,
+                "login": latency_summary(login_latencies),
+                "probe": {"url": PROBE_URL, **latency_summary(probe_latencies)},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Запросы к Redis на один логин, регистрацию и выход.
+
+Считаются отправки команд в Redis (одна команда или весь pipeline -
+одна отправка) из обработчиков запросов, фоновые потоки не учитываются.
+Запуск из каталога src при доступных Postgres и Redis:
+
+    python -m benchmarks.session_roundtrips --requests 200
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import psycogreen.gevent
+
+psycogreen.gevent.patch_psycopg()
+
+import argparse
+import json
+import secrets
+
+from app import app
+from benchmarks.common import CallCounter, Client, latency_summary, start_server
+from core.db import db
+
+
+def measure(counter: CallCounter, endpoint: str, requests: int, call) -> dict:
+    before = counter.redis[endpoint]
+    latencies = [call(number) for number in range(requests)]
+    round_trips = counter.redis[endpoint] - before
+    return {"redis_round_trips_per_request": round_trips / requests, **latency_summary(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="число запросов каждого вида")
+    args = parser.parse_args()
+
+    with app.app_context():
+        counter = CallCounter(db.engine)
+    server, port = start_server(app)
+    client = Client(port)
+    prefix = f"bench-{secrets.token_hex(4)}"
+    password = secrets.token_hex(8)
+    access_tokens = []
+
+    def register(number):
+        status, data, latency = client.request(
+            "POST", "/api/users/register", {"login": f"{prefix}-{number}", "password": password}
+        )
+        if status != 201:
+            raise SystemExit(f"register failed: {status} {data!r}")
+        return latency
+
+    def login(number):
+        status, data, latency = client.request(
+            "POST", "/api/users/login", {"login": f"{prefix}-{number}", "password": password}
+        )
+        if status != 201:
+            raise SystemExit(f"login failed: {status} {data!r}")
+        access_tokens.append(json.loads(data)["access_token"])
+        return latency
+
+    def logout(number):
+        headers = {"Authorization": f"JWT {access_tokens[number]}"}
+        _, _, latency = client.request("POST", "/api/users/logout", headers=headers)
+        return latency
+
+    result = {
+        "register": measure(counter, "users.register", args.requests, register),
+        "login": measure(counter, "users.login", args.requests, login),
+        "logout": measure(counter, "users.logout", args.requests, logout),
+    }
+    server.stop()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
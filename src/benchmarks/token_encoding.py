@@ -0,0 +1,72 @@
+"""Скорость выпуска пары access/refresh токенов.
+
+Сравнивает прежний путь (jwt.encode с декодированием ключа и тремя
+вызовами utcnow на каждый токен) с TokenService.issue_pair.
+Postgres и Redis не нужны. Запуск из каталога src:
+
+    python -m benchmarks.token_encoding --pairs 20000
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import uuid
+from time import perf_counter
+
+import jwt
+
+from core.settings import settings
+from core.tokens import ACCESS_TOKEN_TTL, REFRESH_TOKEN_TTL, tokens
+
+
+def pyjwt_token(user_id, role, exp, login, sid) -> str:
+    payload = {
+        "exp": datetime.datetime.utcnow() + exp,
+        "iat": datetime.datetime.utcnow(),
+        "nbf": datetime.datetime.utcnow(),
+        "sub": json.dumps(user_id.hex),
+        "role": role,
+        "login": login,
+        "sid": sid,
+    }
+    return jwt.encode(payload, key=base64.b64decode(settings.app.jwt_secret_key), algorithm="HS256").decode("utf-8")
+
+
+def pyjwt_pair(user_id, role, login, sid) -> dict[str, str]:
+    return {
+        "access_token": pyjwt_token(user_id, role, ACCESS_TOKEN_TTL, login, sid),
+        "refresh_token": pyjwt_token(user_id, role, REFRESH_TOKEN_TTL, login, sid),
+    }
+
+
+def pairs_per_sec(issue_pair, pairs: int) -> float:
+    args = (uuid.uuid4(), "user", "benchmark", "sid")
+    start = perf_counter()
+    for _ in range(pairs):
+        issue_pair(*args)
+    return pairs / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=20000, help="число пар токенов на каждый вариант")
+    args = parser.parse_args()
+
+    before = pairs_per_sec(pyjwt_pair, args.pairs)
+    after = pairs_per_sec(tokens.issue_pair, args.pairs)
+    print(
+        json.dumps(
+            {
+                "pairs": args.pairs,
+                "pyjwt_tokens_per_sec": before * 2,
+                "token_service_tokens_per_sec": after * 2,
+                "speedup": after / before,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Avro streaming"""
+
+import io
+from typing import Iterable, Iterator
+
+from avro.codecs import KNOWN_CODECS
+from avro.datafile import DataFileWriter
+from avro.io import DatumWriter
+from avro.schema import Schema
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate(0)
+    return data
+
+
+def stream_avro(
+    schema: Schema, records: Iterable[dict], codec: str = "null", sync_marker: bytes = None
+) -> Iterator[bytes]:
+    """Avro-файл по частям: заголовок и блоки по мере заполнения.
+
+    В памяти держится только текущий блок (DataFileWriter сбрасывает блок
+    по достижении SYNC_INTERVAL), поэтому память не зависит от числа записей.
+    Без sync_marker маркер синхронизации случайный, и одинаковые записи
+    дают разные файлы.
+    """
+    if codec not in KNOWN_CODECS:
+        raise ValueError(f"unsupported avro codec: {codec}")
+    sink = io.BytesIO()
+    writer = DataFileWriter(sink, DatumWriter(), schema, codec=codec)
+    if sync_marker is not None:
+        # Заголовок пишется при первой записи блока, маркер можно заменить до нее
+        writer.sync_marker = sync_marker
+    for record in records:
+        writer.append(record)
+        if sink.tell():
+            yield _drain(sink)
+    writer.flush()
+    yield _drain(sink)
@@ -0,0 +1,190 @@
+"""Token denylist"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from time import monotonic
+from typing import Iterable
+
+from redis.client import Pipeline
+from redis.exceptions import RedisError
+
+from core.redis import redis
+from core.settings import settings
+from core.tokens import ACCESS_TOKEN_TTL, LEEWAY
+
+DENIED_KEY = "denylist"
+DENIED_CHANNEL = "tokens:denied"
+SUBSCRIBE_TIMEOUT = 5.0
+
+# Access-токен сессии, выпущенный перед выходом, действует не дольше этого
+SESSION_DENY_TTL = int((ACCESS_TOKEN_TTL + LEEWAY).total_seconds())
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Фильтр Блума: без ложноотрицательных ответов, ложноположительные с малой вероятностью."""
+
+    def __init__(self, size: int, hashes: int):
+        self.size = size
+        self.hashes = hashes
+        self._bits = bytearray((size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:16], "little") | 1
+        return [(first + number * second) % self.size for number in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenDenylist:
+    """Отозванные до истечения access-токены.
+
+    В Redis отзывы хранятся в одном отсортированном множестве denylist:
+    элемент jti:<jti> или sid:<sid>, оценка - время, когда отозванные
+    токены истекут. Отзыв публикуется в канал tokens:denied. Воркер держит
+    копию в фильтре Блума: загружает действующие записи (ZRANGEBYSCORE)
+    при старте приложения, дополняет из канала и периодически пересобирает,
+    удаляя истекшие записи (ZREMRANGEBYSCORE). Проверка токена - поиск
+    битов в памяти; только при срабатывании фильтра отзыв подтверждается
+    одним ZMSCORE.
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Загрузить список при старте, чтобы первый запрос воркера не ждал загрузки."""
+        try:
+            self._load()
+        except RedisError:
+            logger.exception("Список отозванных токенов будет загружен при первой проверке")
+
+    @staticmethod
+    def _ids(claims: dict) -> list[str]:
+        ids = []
+        if jti := claims.get("jti"):
+            ids.append(f"jti:{jti}")
+        if sid := claims.get("sid"):
+            ids.append(f"sid:{sid}")
+        return ids
+
+    @staticmethod
+    def _add(pipeline: Pipeline, denied_id: str, expires_at: float) -> None:
+        if expires_at > time.time():
+            # GT: повторный отзыв не сокращает срок записи
+            pipeline.zadd(DENIED_KEY, {denied_id: expires_at}, gt=True)
+            pipeline.publish(DENIED_CHANNEL, denied_id)
+
+    def deny(self, claims: dict, pipeline: Pipeline = None) -> None:
+        """Отозвать токен и остальные access-токены его сессии.
+
+        С pipeline команды уходят в Redis при его execute().
+        """
+        pipe = redis.pipeline() if pipeline is None else pipeline
+        if jti := claims.get("jti"):
+            self._add(pipe, f"jti:{jti}", claims["exp"] + LEEWAY.total_seconds())
+        if sid := claims.get("sid"):
+            self._add(pipe, f"sid:{sid}", time.time() + SESSION_DENY_TTL)
+        if pipeline is None:
+            pipe.execute()
+
+    def deny_sessions(self, sids: Iterable[str], pipeline: Pipeline = None) -> None:
+        """Отозвать access-токены сессий."""
+        pipe = redis.pipeline() if pipeline is None else pipeline
+        expires_at = time.time() + SESSION_DENY_TTL
+        for sid in sids:
+            self._add(pipe, f"sid:{sid}", expires_at)
+        if pipeline is None:
+            pipe.execute()
+
+    def is_denied(self, claims: dict) -> bool:
+        """Токен отозван."""
+        return self.denied_many([claims])[0]
+
+    def denied_many(self, claims_list: list[dict]) -> list[bool]:
+        """Отозваны ли токены; срабатывания фильтра подтверждаются одним ZMSCORE."""
+        ids = [self._ids(claims) for claims in claims_list]
+        if not any(ids):
+            return [False] * len(claims_list)
+        bloom = self._load()
+        candidates = [[denied_id for denied_id in token_ids if denied_id in bloom] for token_ids in ids]
+        members = [denied_id for token_ids in candidates for denied_id in token_ids]
+        if not members:
+            return [False] * len(claims_list)
+        now = time.time()
+        expires = dict(zip(members, redis.zmscore(DENIED_KEY, members)))
+        return [any((expires[denied_id] or 0) > now for denied_id in token_ids) for token_ids in candidates]
+
+    @staticmethod
+    def _build() -> BloomFilter:
+        bloom = BloomFilter(settings.app.denylist_bloom_size, settings.app.denylist_bloom_hashes)
+        now = time.time()
+        pipeline = redis.pipeline()
+        pipeline.zremrangebyscore(DENIED_KEY, "-inf", now)
+        pipeline.zrangebyscore(DENIED_KEY, now, "+inf")
+        _, denied_ids = pipeline.execute()
+        for denied_id in denied_ids:
+            bloom.add(denied_id.decode("utf-8"))
+        return bloom
+
+    @staticmethod
+    def _subscribe():
+        pubsub = redis.pubsub()
+        pubsub.subscribe(DENIED_CHANNEL)
+        # Ждем ответ на SUBSCRIBE: отзыв, опубликованный после него, дойдет до воркера
+        message = pubsub.get_message(timeout=SUBSCRIBE_TIMEOUT)
+        if message is None or message["type"] != "subscribe":
+            pubsub.close()
+            raise RedisError("Подписка на канал отозванных токенов не подтверждена")
+        return pubsub
+
+    def _load(self) -> BloomFilter:
+        # Фильтр, загруженный до fork, без потока подписки: дочерний процесс загружает свой
+        if self._filter is not None and self._pid == os.getpid():
+            return self._filter
+        with self._lock:
+            if self._filter is None or self._pid != os.getpid():
+                # Подписка до загрузки: отзыв, опубликованный во время загрузки, не теряется
+                pubsub = self._subscribe()
+                self._filter = self._build()
+                self._pid = os.getpid()
+                threading.Thread(target=self._listen, args=(pubsub,), name="token-denylist", daemon=True).start()
+        return self._filter
+
+    def _listen(self, pubsub) -> None:
+        rebuild_at = monotonic() + settings.app.denylist_rebuild_interval
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self._subscribe()
+                    self._filter = self._build()
+                    rebuild_at = monotonic() + settings.app.denylist_rebuild_interval
+                message = pubsub.get_message(timeout=max(0.0, rebuild_at - monotonic()))
+                if message is not None and message["type"] == "message":
+                    self._filter.add(message["data"].decode("utf-8"))
+                if monotonic() >= rebuild_at:
+                    self._filter = self._build()
+                    rebuild_at = monotonic() + settings.app.denylist_rebuild_interval
+                continue
+            except Exception:
+                logger.exception("Ошибка обновления списка отозванных токенов")
+            if pubsub is not None:
+                pubsub.close()
+            pubsub = None
+            time.sleep(1)
+
+
+token_denylist = TokenDenylist()
@@ -0,0 +1,225 @@
+"""Password hashing"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import string
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar
+
+from gevent import monkey
+
+from core.settings import settings
+
+T = TypeVar("T")
+
+SALT_ALPHABET = string.ascii_letters + string.digits
+
+# Пароль, который не совпадает ни с одним хешем: вход только после смены пароля или через OAuth
+UNUSABLE_PASSWORD = "!"
+
+# Длина дайджеста pbkdf2.crypt (24 байта в base64) в хеше без маркера версии
+LEGACY_DIGEST_LENGTH = 32
+
+
+def p5k2_crypt(word: str, salt: str, iterations: int) -> str:
+    """pbkdf2.crypt на hashlib.pbkdf2_hmac: тот же результат, но в C и без GIL."""
+    if iterations == 400:
+        salt = f"$p5k2$${salt}"
+    else:
+        salt = f"$p5k2${iterations:x}${salt}"
+    rawhash = hashlib.pbkdf2_hmac("sha1", word.encode("utf-8"), salt.encode("us-ascii"), iterations, 24)
+    return f"{salt}${base64.b64encode(rawhash, b'./').decode('us-ascii')}"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data, b"./").decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4), b"./")
+
+
+def _split(encoded: str) -> tuple[str, str, str, str]:
+    """Алгоритм, параметры, соль и дайджест из хеша $<алгоритм>$<параметры>$<соль>$<дайджест>."""
+    _, scheme, params, salt, digest = encoded.split("$")
+    return scheme, params, salt, digest
+
+
+class PasswordHasher(ABC):
+    """Алгоритм хеширования паролей."""
+
+    scheme: str
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Хеш пароля с текущими параметрами."""
+        pass
+
+    @abstractmethod
+    def verify(self, password: str, encoded: str) -> bool:
+        """Проверка пароля по хешу."""
+        pass
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """Хеш создан с параметрами, отличными от текущих."""
+        return _split(encoded)[1] != self.params()
+
+    def params(self) -> str:
+        """Текущие параметры в формате хеша."""
+        return ""
+
+
+class LegacyP5k2Hasher(PasswordHasher):
+    """Хеш без маркера версии: соль и дайджест pbkdf2.crypt подряд.
+
+    Число итераций в хеше не записано, поэтому для него своя настройка,
+    не зависящая от параметров текущего алгоритма.
+    """
+
+    scheme = "p5k2"
+
+    def hash(self, password: str) -> str:
+        salt = "".join(secrets.choice(SALT_ALPHABET) for _ in range(settings.app.salt_length))
+        parts = p5k2_crypt(password, salt, settings.app.legacy_psw_hash_iterations).split("$")
+        return f"{parts[3]}{parts[4]}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        salt = encoded[: settings.app.salt_length]
+        digest = p5k2_crypt(password, salt, settings.app.legacy_psw_hash_iterations).split("$")[4]
+        return hmac.compare_digest(digest, encoded[settings.app.salt_length :])
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return False
+
+
+class Pbkdf2Sha256Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256: $pbkdf2-sha256$i=<итерации>$<соль>$<дайджест>."""
+
+    scheme = "pbkdf2-sha256"
+
+    def params(self) -> str:
+        return f"i={settings.app.psw_hash_iterations}"
+
+    @staticmethod
+    def _digest(password: str, salt: bytes, iterations: int) -> bytes:
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._digest(password, salt, settings.app.psw_hash_iterations)
+        return f"${self.scheme}${self.params()}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, params, salt, digest = _split(encoded)
+        iterations = int(params.removeprefix("i="))
+        return hmac.compare_digest(self._digest(password, _b64decode(salt), iterations), _b64decode(digest))
+
+
+class ScryptHasher(PasswordHasher):
+    """scrypt: $scrypt$n=<N>,r=<r>,p=<p>$<соль>$<дайджест>."""
+
+    scheme = "scrypt"
+
+    def params(self) -> str:
+        return f"n={settings.app.scrypt_n},r={settings.app.scrypt_r},p={settings.app.scrypt_p}"
+
+    @staticmethod
+    def _digest(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._digest(password, salt, settings.app.scrypt_n, settings.app.scrypt_r, settings.app.scrypt_p)
+        return f"${self.scheme}${self.params()}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, params, salt, digest = _split(encoded)
+        values = {key: int(value) for key, value in (item.split("=") for item in params.split(","))}
+        expected = self._digest(password, _b64decode(salt), values["n"], values["r"], values["p"])
+        return hmac.compare_digest(expected, _b64decode(digest))
+
+
+PASSWORD_HASHERS: dict[str, PasswordHasher] = {
+    hasher.scheme: hasher for hasher in (LegacyP5k2Hasher(), Pbkdf2Sha256Hasher(), ScryptHasher())
+}
+
+
+def identify_hasher(encoded: str) -> Optional[PasswordHasher]:
+    """Алгоритм, которым создан хеш; None для пустого, непригодного или неизвестного значения."""
+    if not encoded or encoded.startswith(UNUSABLE_PASSWORD):
+        return None
+    if not encoded.startswith("$"):
+        if len(encoded) != settings.app.salt_length + LEGACY_DIGEST_LENGTH:
+            return None
+        return PASSWORD_HASHERS[LegacyP5k2Hasher.scheme]
+    return PASSWORD_HASHERS.get(encoded.split("$")[1])
+
+
+def hash_password(password: str) -> str:
+    """Хеш пароля текущим алгоритмом."""
+    return PASSWORD_HASHERS[settings.app.password_scheme].hash(password)
+
+
+def verify_password(password: str, encoded: str) -> tuple[bool, bool]:
+    """Проверка пароля.
+
+    Второй элемент результата - нужно ли перехешировать пароль текущим алгоритмом.
+    Значение, не являющееся хешем, не совпадает ни с одним паролем, и KDF
+    для него не считается; поврежденный хеш тоже дает отказ, а не ошибку.
+    """
+    hasher = identify_hasher(encoded)
+    if hasher is None:
+        return False, False
+    try:
+        valid = hasher.verify(password, encoded)
+    except (ValueError, KeyError):
+        # Неверное число полей, параметры или base64 (binascii.Error - тоже ValueError)
+        return False, False
+    if not valid:
+        return False, False
+    return True, hasher.scheme != settings.app.password_scheme or hasher.needs_rehash(encoded)
+
+
+class HashExecutor:
+    """Выполнение KDF вне цикла событий.
+
+    В режиме thread хеширование идет в пуле системных потоков
+    (под gevent - в пуле gevent), и хаб продолжает обслуживать
+    остальные запросы. Режим inline считает хеш в текущем потоке.
+    """
+
+    def __init__(self):
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if monkey.is_module_patched("threading"):
+                from gevent.threadpool import ThreadPool
+
+                self._pool = ThreadPool(settings.app.hash_workers)
+            else:
+                self._pool = ThreadPoolExecutor(settings.app.hash_workers)
+        return self._pool
+
+    def run(self, func: Callable[..., T], *args) -> T:
+        if settings.app.hash_executor == "inline":
+            return func(*args)
+        pool = self._get_pool()
+        if isinstance(pool, ThreadPoolExecutor):
+            return pool.submit(func, *args).result()
+        return pool.apply(func, args)
+
+    def map(self, func: Callable[..., T], items: Iterable) -> list[T]:
+        """func для каждого элемента; в режиме thread - параллельно на всех потоках пула."""
+        if settings.app.hash_executor == "inline":
+            return [func(item) for item in items]
+        pool = self._get_pool()
+        if isinstance(pool, ThreadPoolExecutor):
+            return list(pool.map(func, items))
+        return pool.map(func, items)
+
+
+hash_executor = HashExecutor()
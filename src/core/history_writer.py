@@ -0,0 +1,190 @@
+"""Login history writer"""
+
+import atexit
+import datetime
+import logging
+import os
+import socket
+import threading
+import uuid
+from time import monotonic
+
+from redis.client import Pipeline
+from redis.exceptions import ResponseError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.db import db
+from core.redis import redis
+from core.settings import settings
+from models.login_history import Login, device_type
+
+STREAM_KEY = "login_history"
+GROUP_NAME = "history_writers"
+
+logger = logging.getLogger(__name__)
+
+
+class LoginHistoryWriter:
+    """Запись истории входов пачками.
+
+    События входа добавляются в поток Redis (XADD) и не теряются при
+    перезапуске воркера. Фоновый поток воркера читает их через группу
+    потребителей, вставляет в history одним многострочным INSERT по
+    размеру пачки или по таймауту и подтверждает (XACK) только после commit.
+    События упавших воркеров забираются через XAUTOCLAIM. При остановке
+    воркера поток дописывает все прочитанные и оставшиеся в потоке события.
+
+    При history.async_write = False строка истории добавляется в текущую
+    сессию и сохраняется commit-ом обработчика.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+
+    def init_app(self, app) -> None:
+        self._app = app
+        atexit.register(self.drain)
+
+    def record(self, user_id, login: str, ip: str, user_agent: str, pipeline: Pipeline = None) -> None:
+        """Зарегистрировать вход пользователя.
+
+        С pipeline событие уходит в Redis при его execute().
+        """
+        event = {
+            "id": uuid.uuid4().hex,
+            "user_id": str(user_id),
+            "dt": datetime.datetime.utcnow().isoformat(),
+            "login": login,
+            "ip": ip,
+            "user_agent": user_agent,
+        }
+        if not settings.history.async_write:
+            db.session.add(Login(**self._row(event)))
+            return
+        (redis if pipeline is None else pipeline).xadd(STREAM_KEY, event)
+        self._start()
+
+    def drain(self) -> None:
+        """Остановить фоновый поток, дописав все события в БД."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join()
+        self._stopping.clear()
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="login-history-writer", daemon=True)
+                self._thread.start()
+
+    @staticmethod
+    def _row(event: dict) -> dict:
+        return {
+            "id": uuid.UUID(event["id"]),
+            "user_id": uuid.UUID(event["user_id"]),
+            "dt": datetime.datetime.fromisoformat(event["dt"]),
+            "login": event["login"],
+            "ip": event["ip"],
+            "user_agent": event["user_agent"],
+            "user_device_type": device_type(event["user_agent"]),
+        }
+
+    def _create_group(self) -> None:
+        try:
+            redis.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+        except ResponseError as err:
+            if "BUSYGROUP" not in str(err):
+                raise
+
+    def _claim(self, count: int) -> list[tuple[bytes, dict]]:
+        """Забрать зависшие события упавших воркеров.
+
+        Событие, удаленное из потока после чтения, Redis 6.2 возвращает
+        без id и полей, а из списка ожидающих не убирает. Поэтому забираются
+        только id, поля читаются XRANGE, а удаленные события подтверждаются.
+        """
+        ids = redis.xautoclaim(
+            STREAM_KEY,
+            GROUP_NAME,
+            self._consumer,
+            min_idle_time=settings.history.claim_idle_time,
+            count=count,
+            justid=True,
+        )
+        if not ids:
+            return []
+        pipeline = redis.pipeline(transaction=False)
+        for message_id in ids:
+            pipeline.xrange(STREAM_KEY, message_id, message_id)
+        claimed = [entries[0] for entries in pipeline.execute() if entries]
+        if deleted := set(ids) - {message_id for message_id, _ in claimed}:
+            redis.xack(STREAM_KEY, GROUP_NAME, *deleted)
+        return claimed
+
+    def _read(self, count: int, block_ms: int = None) -> list[tuple[bytes, dict]]:
+        """Чужие зависшие и новые события потока."""
+        if claimed := self._claim(count):
+            return claimed
+        response = redis.xreadgroup(GROUP_NAME, self._consumer, {STREAM_KEY: ">"}, count=count, block=block_ms)
+        return response[0][1] if response else []
+
+    def _write(self, messages: list[tuple[bytes, dict]]) -> None:
+        """Вставка пачки событий и подтверждение их в потоке."""
+        rows = [
+            self._row({key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()})
+            for _, fields in messages
+        ]
+        statement = insert(Login.__table__).on_conflict_do_nothing()
+        try:
+            db.session.execute(statement.values(rows))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            logger.exception("Пачка истории входов не записана, запись по одной строке")
+            for row in rows:
+                try:
+                    db.session.execute(statement.values(row))
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    logger.exception("Событие входа %s отброшено", row["id"])
+        ids = [message_id for message_id, _ in messages]
+        pipeline = redis.pipeline()
+        pipeline.xack(STREAM_KEY, GROUP_NAME, *ids)
+        pipeline.xdel(STREAM_KEY, *ids)
+        pipeline.execute()
+
+    def _run(self) -> None:
+        batch_size = settings.history.batch_size
+        with self._app.app_context():
+            self._create_group()
+            pending = []
+            deadline = monotonic() + settings.history.flush_interval
+            while not self._stopping.is_set():
+                try:
+                    block_ms = max(1, int((deadline - monotonic()) * 1000))
+                    pending += self._read(batch_size - len(pending), block_ms)
+                    if pending and (len(pending) >= batch_size or monotonic() >= deadline):
+                        self._write(pending)
+                        pending = []
+                except Exception:
+                    logger.exception("Ошибка записи истории входов")
+                    self._stopping.wait(settings.history.flush_interval)
+                if monotonic() >= deadline:
+                    deadline = monotonic() + settings.history.flush_interval
+            while pending:
+                self._write(pending)
+                pending = self._read(batch_size)
+
+
+history_writer = LoginHistoryWriter()
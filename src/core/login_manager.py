@@ -1,8 +1,14 @@
 """Login manager"""
 
+import jwt
+from flask import g
 from flask_login import LoginManager
-from werkzeug.security import generate_password_hash, check_password_hash
 
+from core.denylist import token_denylist
+from core.principal import TokenPrincipal
+from core.settings import settings
+from core.token_cache import token_cache
+from core.tokens import tokens
 from models.db_models import User
 
 login_manager = LoginManager()
@@ -15,11 +21,20 @@ def load_user(user_id):
 
 def authenticate(login, password):
     user = User.query.filter_by(login=login).first()
-    hash = generate_password_hash(user.password)
-    if user and check_password_hash(hash, password):
+    if user and user.check_password(password):
         return user
 
 
+def decode_token(token: str) -> dict:
+    claims = token_cache.decode(token, tokens.decode)
+    if token_denylist.is_denied(claims):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return claims
+
+
 def identity(payload):
+    g.jwt_payload = payload
+    if settings.app.stateless_identity and (principal := TokenPrincipal.from_payload(payload)):
+        return principal
     user_id = payload["sub"].strip('"')
     return User.query.filter_by(id=user_id).first()
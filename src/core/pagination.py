@@ -0,0 +1,20 @@
+"""Keyset pagination"""
+
+import base64
+import json
+
+
+def encode_cursor(*values: str) -> str:
+    """Непрозрачный курсор из значений ключа сортировки последней строки страницы."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    """Значения ключа сортировки из курсора; ValueError для некорректного курсора."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as err:
+        raise ValueError("invalid cursor") from err
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError("invalid cursor")
+    return values
@@ -0,0 +1,64 @@
+"""Role permission cache"""
+
+import uuid
+from time import monotonic
+from typing import Iterable
+
+from sqlalchemy.orm import selectinload
+
+from core.redis import redis
+from core.settings import settings
+from models.db_models import Role
+
+VERSION_KEY = "permissions:version"
+
+
+class RolePermissionCache:
+    """Разрешения ролей в памяти воркера.
+
+    Версия данных хранится в Redis: изменение ролей увеличивает её,
+    и каждый воркер при следующей проверке перечитывает роли.
+    """
+
+    def __init__(self):
+        self._by_id: dict[uuid.UUID, frozenset[str]] = {}
+        self._by_name: dict[str, uuid.UUID] = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def _refresh(self) -> None:
+        """Перечитать роли, если версия в Redis изменилась."""
+        now = monotonic()
+        if self._version is not None and now - self._checked_at < settings.app.permission_cache_check_interval:
+            return
+        version = redis.get(VERSION_KEY) or b"0"
+        self._checked_at = now
+        if version == self._version:
+            return
+        roles = Role.query.options(selectinload(Role.permissions)).all()
+        self._by_id = {
+            role.id: frozenset(permission.name.name for permission in role.permissions) for role in roles
+        }
+        self._by_name = {role.name: role.id for role in roles}
+        self._version = version
+
+    def _union(self, role_ids: Iterable[uuid.UUID]) -> frozenset[str]:
+        return frozenset().union(*(self._by_id.get(role_id, frozenset()) for role_id in role_ids))
+
+    def role_permissions(self, role_ids: Iterable[uuid.UUID]) -> frozenset[str]:
+        """Объединение разрешений ролей по их идентификаторам."""
+        self._refresh()
+        return self._union(role_ids)
+
+    def role_name_permissions(self, role_names: Iterable[str]) -> frozenset[str]:
+        """Объединение разрешений ролей по их названиям."""
+        self._refresh()
+        return self._union(self._by_name[name] for name in role_names if name in self._by_name)
+
+    def invalidate(self) -> None:
+        """Сбросить кэш во всех воркерах."""
+        redis.incr(VERSION_KEY)
+        self._version = None
+
+
+permission_cache = RolePermissionCache()
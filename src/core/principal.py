@@ -0,0 +1,48 @@
+"""Token principal"""
+
+import uuid
+
+from models.db_models import User
+
+
+class TokenPrincipal:
+    """Пользователь, восстановленный из клеймов проверенного JWT без запроса в БД.
+
+    Полная ORM-модель User загружается лениво, только при обращении
+    к атрибутам, которых нет в токене.
+    """
+
+    __slots__ = ("id", "login", "role_names", "_user")
+
+    def __init__(self, user_id: uuid.UUID, login: str, role_names: tuple[str, ...]):
+        object.__setattr__(self, "id", user_id)
+        object.__setattr__(self, "login", login)
+        object.__setattr__(self, "role_names", role_names)
+        object.__setattr__(self, "_user", None)
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        """Principal из клеймов токена; None для токенов без клейма login."""
+        if "login" not in payload:
+            return None
+        role = payload.get("role") or ""
+        return cls(
+            user_id=uuid.UUID(payload["sub"].strip('"')),
+            login=payload["login"],
+            role_names=tuple(name for name in role.split(",") if name),
+        )
+
+    def load_user(self) -> User:
+        """ORM-модель пользователя."""
+        if self._user is None:
+            object.__setattr__(self, "_user", User.query.filter_by(id=self.id).first())
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.load_user(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load_user(), name, value)
+
+    def __repr__(self):
+        return f"<User {self.id}>"
@@ -0,0 +1,90 @@
+"""Refresh sessions"""
+
+import secrets
+import time
+import uuid
+
+from redis.client import Pipeline
+
+from core.redis import redis
+from core.tokens import REFRESH_TOKEN_TTL
+
+SESSION_TTL = int(REFRESH_TOKEN_TTL.total_seconds())
+
+
+class SessionStore:
+    """Refresh-сессии пользователей в Redis.
+
+    Все сессии пользователя лежат в одном sorted set sessions:{user_id}:
+    элемент - короткий идентификатор сессии (клейм sid токенов),
+    score - время истечения. Истекшие сессии удаляются при создании новой.
+
+    Изменяющие методы принимают pipeline: команды добавляются в него и
+    уходят в Redis вместе с остальными командами запроса при execute().
+    Без pipeline команды метода выполняются одной транзакцией MULTI/EXEC.
+    """
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"sessions:{uuid.UUID(str(user_id)).hex}"
+
+    @staticmethod
+    def _run(pipeline: Pipeline, commands) -> None:
+        own = pipeline is None
+        if own:
+            pipeline = redis.pipeline()
+        commands(pipeline)
+        if own:
+            pipeline.execute()
+
+    def create(self, user_id: uuid.UUID, pipeline: Pipeline = None) -> str:
+        """Новая сессия; возвращает sid."""
+        sid = secrets.token_urlsafe(12)
+        now = int(time.time())
+        key = self._key(user_id)
+
+        def commands(pipe: Pipeline) -> None:
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zadd(key, {sid: now + SESSION_TTL})
+            pipe.expire(key, SESSION_TTL)
+
+        self._run(pipeline, commands)
+        return sid
+
+    def exists(self, user_id, sid: str) -> bool:
+        """Сессия активна."""
+        expires_at = redis.zscore(self._key(user_id), sid)
+        return expires_at is not None and expires_at > time.time()
+
+    def sids(self, user_id) -> list[str]:
+        """Идентификаторы сессий пользователя."""
+        return [sid.decode("utf-8") for sid in redis.zrange(self._key(user_id), 0, -1)]
+
+    def exists_many(self, sessions: list[tuple]) -> list[bool]:
+        """Активность сессий (user_id, sid) одним pipeline."""
+        if not sessions:
+            return []
+        pipeline = redis.pipeline(transaction=False)
+        for user_id, sid in sessions:
+            pipeline.zscore(self._key(user_id), sid)
+        now = time.time()
+        return [expires_at is not None and expires_at > now for expires_at in pipeline.execute()]
+
+    def revoke(self, user_id: uuid.UUID, sid: str, pipeline: Pipeline = None) -> None:
+        """Завершить одну сессию."""
+
+        def commands(pipe: Pipeline) -> None:
+            pipe.zrem(self._key(user_id), sid)
+
+        self._run(pipeline, commands)
+
+    def revoke_all(self, user_id: uuid.UUID, pipeline: Pipeline = None) -> None:
+        """Завершить все сессии пользователя."""
+
+        def commands(pipe: Pipeline) -> None:
+            pipe.delete(self._key(user_id))
+
+        self._run(pipeline, commands)
+
+
+sessions = SessionStore()
@@ -30,9 +30,25 @@ class Postgres(BaseModel):
 
 class App(BaseModel):
     jwt_secret_key: str
+    jwt_key_dir: str = ""
+    jwt_kid: str = ""
+    jwks_max_age: int = 86400
     psw_hash_iterations: int = 1000
+    legacy_psw_hash_iterations: int = 1000
     salt_length: int = 20
-    kdf_algorithm: str = "p5k2"
+    password_scheme: str = "pbkdf2-sha256"
+    scrypt_n: int = 16384
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+    hash_executor: str = "thread"
+    hash_workers: int = 4
+    stateless_identity: bool = True
+    permission_cache_check_interval: float = 1.0
+    import_batch_size: int = 5000
+    token_cache_size: int = 10000
+    denylist_bloom_size: int = 1 << 20
+    denylist_bloom_hashes: int = 7
+    denylist_rebuild_interval: float = 60.0
 
 
 class OAuth(BaseModel):
@@ -46,6 +62,15 @@ class Jaeger(BaseModel):
     gui_port: int = Field(16686)
 
 
+class History(BaseModel):
+    async_write: bool = True
+    batch_size: int = 500
+    flush_interval: float = 1.0
+    claim_idle_time: int = 60000
+    user_agent_cache_size: int = 1024
+    user_agent_fast_path: bool = True
+
+
 class Settings(BaseSettings):
     redis: Redis
     postgres: Postgres
@@ -53,10 +78,15 @@ class Settings(BaseSettings):
     oauth: OAuth
     superuser: Superuser
     jaeger: Jaeger
+    history: History = History()
     debug: bool = Field(False)
-    avro_path: Path = BASE_DIR.joinpath("avro_schemes")
+    avro_codec: str = Field("deflate")
+    avro_batch_size: int = Field(1000)
+    avro_snapshot_ttl: int = Field(3600)
     disable_trace: bool = Field(False)
     disable_limiter: bool = Field(False)
+    limiter_tolerance: float = Field(0.1)
+    limiter_min_lease: int = Field(2)
 
     class Config:
         env_file = BASE_DIR.joinpath(".env")
@@ -0,0 +1,57 @@
+"""Verified token cache"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from core.settings import settings
+
+
+class VerifiedTokenCache:
+    """Клеймы проверенных access-токенов в памяти воркера.
+
+    Ключ - sha256 токена, запись живет до exp токена, при переполнении
+    вытесняется давно не использованная. Повторный запрос с тем же токеном
+    не проверяет подпись и не разбирает JSON.
+
+    Кэш не знает об отзыве: отозванный токен остается в нем до exp,
+    и после кэша токен проверяется по списку отозванных токенов.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, token: str, decode: Callable[[str], dict]) -> dict:
+        """Клеймы токена из кэша или результат decode(token)."""
+        if settings.app.token_cache_size <= 0:
+            return decode(token)
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        if (claims := self._get(key)) is not None:
+            return claims
+        claims = decode(token)
+        self._put(key, claims)
+        return claims
+
+    def _get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def _put(self, key: bytes, claims: dict) -> None:
+        with self._lock:
+            self._entries[key] = (claims, claims["exp"])
+            while len(self._entries) > settings.app.token_cache_size:
+                self._entries.popitem(last=False)
+
+
+token_cache = VerifiedTokenCache()
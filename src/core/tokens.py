@@ -0,0 +1,270 @@
+"""Token service"""
+
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import secrets
+import time
+import uuid
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import jwt
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from jwt.algorithms import Algorithm
+from jwt.exceptions import InvalidKeyError
+
+from core.settings import settings
+
+ACCESS_TOKEN_TTL = datetime.timedelta(minutes=10)
+REFRESH_TOKEN_TTL = datetime.timedelta(days=7)
+
+# Допуск на расхождение часов при проверке exp и nbf, как у Flask-JWT по умолчанию
+LEEWAY = datetime.timedelta(seconds=10)
+REQUIRED_CLAIMS = ("exp", "iat", "nbf")
+
+# Значения клейма typ: refresh-токен не принимается вместо access и наоборот
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64int(value: int) -> str:
+    return _b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).decode("ascii")
+
+
+def _header(claims: dict) -> bytes:
+    return _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+
+
+class RS256Algorithm(Algorithm):
+    """RS256: PyJWT 1.x вызывает signer()/verifier(), которых нет в текущем cryptography."""
+
+    def prepare_key(self, key):
+        if isinstance(key, (RSAPrivateKey, RSAPublicKey)):
+            return key
+        raise InvalidKeyError("Expecting an RSA key")
+
+    def sign(self, msg: bytes, key: RSAPrivateKey) -> bytes:
+        return key.sign(msg, padding.PKCS1v15(), hashes.SHA256())
+
+    def verify(self, msg: bytes, key, sig: bytes) -> bool:
+        if isinstance(key, RSAPrivateKey):
+            key = key.public_key()
+        try:
+            key.verify(sig, msg, padding.PKCS1v15(), hashes.SHA256())
+        except InvalidSignature:
+            return False
+        return True
+
+
+class Ed25519Algorithm(Algorithm):
+    """EdDSA (Ed25519): в PyJWT 1.x этого алгоритма нет."""
+
+    def prepare_key(self, key):
+        if isinstance(key, (Ed25519PrivateKey, Ed25519PublicKey)):
+            return key
+        raise InvalidKeyError("Expecting an Ed25519 key")
+
+    def sign(self, msg: bytes, key: Ed25519PrivateKey) -> bytes:
+        return key.sign(msg)
+
+    def verify(self, msg: bytes, key, sig: bytes) -> bool:
+        if isinstance(key, Ed25519PrivateKey):
+            key = key.public_key()
+        try:
+            key.verify(sig, msg)
+        except InvalidSignature:
+            return False
+        return True
+
+
+ASYMMETRIC_ALGORITHMS: dict[str, Algorithm] = {
+    "RS256": RS256Algorithm(),
+    "EdDSA": Ed25519Algorithm(),
+}
+
+
+class SigningKey(NamedTuple):
+    kid: str
+    alg: str
+    public_key: object
+    private_key: Optional[object]
+
+    def jwk(self) -> dict:
+        """Открытый ключ в формате JWK (RFC 7517, RFC 8037)."""
+        if self.alg == "RS256":
+            numbers = self.public_key.public_numbers()
+            params = {"kty": "RSA", "n": _b64int(numbers.n), "e": _b64int(numbers.e)}
+        else:
+            raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            params = {"kty": "OKP", "crv": "Ed25519", "x": _b64encode(raw).decode("ascii")}
+        return {"kid": self.kid, "use": "sig", "alg": self.alg, **params}
+
+
+def load_keys(key_dir: str) -> dict[str, SigningKey]:
+    """Ключи из PEM-файлов каталога; kid - имя файла без расширения.
+
+    Файл с закрытым ключом позволяет подписывать, файл только с открытым
+    ключом - проверять токены, выпущенные выведенным из работы ключом.
+    """
+    keys = {}
+    for path in sorted(Path(key_dir).glob("*.pem")):
+        data = path.read_bytes()
+        private_key = None
+        if b"PRIVATE KEY" in data:
+            private_key = serialization.load_pem_private_key(data, password=None)
+            public_key = private_key.public_key()
+        else:
+            public_key = serialization.load_pem_public_key(data)
+        if isinstance(public_key, RSAPublicKey):
+            alg = "RS256"
+        elif isinstance(public_key, Ed25519PublicKey):
+            alg = "EdDSA"
+        else:
+            raise ValueError(f"{path}: поддерживаются только ключи RSA и Ed25519")
+        keys[path.stem] = SigningKey(path.stem, alg, public_key, private_key)
+    return keys
+
+
+class KeyRing:
+    """Ключи подписи, собранные из настроек.
+
+    Без settings.app.jwt_kid токены подписываются HS256 общим секретом,
+    с ним - закрытым ключом jwt_kid из каталога jwt_key_dir (RS256 или EdDSA
+    по типу ключа) с kid в заголовке. Токены без kid проверяются секретом.
+    """
+
+    def __init__(self, secret: str, key_dir: str, kid: str):
+        self.config = (secret, key_dir, kid)
+        self.secret = base64.b64decode(secret)
+        self.hmac = hmac.new(self.secret, digestmod=hashlib.sha256)
+        self.keys = load_keys(key_dir) if key_dir else {}
+        self.signing_key = None
+        if kid:
+            self.signing_key = self.keys.get(kid)
+            if self.signing_key is None or self.signing_key.private_key is None:
+                raise ValueError(f"Нет закрытого ключа {kid} в {key_dir!r}")
+            self.header = _header({"typ": "JWT", "alg": self.signing_key.alg, "kid": kid})
+        else:
+            self.header = _header({"typ": "JWT", "alg": "HS256"})
+
+    def sign(self, signing_input: bytes) -> bytes:
+        if self.signing_key is None:
+            signature = self.hmac.copy()
+            signature.update(signing_input)
+            return signature.digest()
+        return ASYMMETRIC_ALGORITHMS[self.signing_key.alg].sign(signing_input, self.signing_key.private_key)
+
+
+class TokenService:
+    """Выпуск и проверка JWT.
+
+    Ключи загружаются из настроек один раз (и заново при их изменении),
+    заголовок сериализован заранее, HS256-подпись считается копией готового
+    HMAC-контекста. Клеймы exp, iat и nbf пары токенов считаются от одной
+    метки времени. Ошибки (неверный ключ, несериализуемые клеймы) не
+    перехватываются.
+    """
+
+    def __init__(self):
+        self._keyring = None
+        self._jwt = jwt.PyJWT()
+        for name, algorithm in ASYMMETRIC_ALGORITHMS.items():
+            if name in self._jwt.get_algorithms():
+                self._jwt.unregister_algorithm(name)
+            self._jwt.register_algorithm(name, algorithm)
+
+    @property
+    def keyring(self) -> KeyRing:
+        config = (settings.app.jwt_secret_key, settings.app.jwt_key_dir, settings.app.jwt_kid)
+        if self._keyring is None or self._keyring.config != config:
+            self._keyring = KeyRing(*config)
+        return self._keyring
+
+    def encode(self, claims: dict) -> str:
+        """Подписанный токен с переданными клеймами."""
+        keyring = self.keyring
+        signing_input = keyring.header + b"." + _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return (signing_input + b"." + _b64encode(keyring.sign(signing_input))).decode("ascii")
+
+    def decode(self, token: str, typ: str = ACCESS_TOKEN) -> dict:
+        """Клеймы токена типа typ.
+
+        При неверной подписи, неизвестном kid, истекшем сроке или другом
+        типе токена - jwt.InvalidTokenError.
+        """
+        keyring = self.keyring
+        kid = self._jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            key, algorithm = keyring.secret, "HS256"
+        elif signing_key := keyring.keys.get(kid):
+            key, algorithm = signing_key.public_key, signing_key.alg
+        else:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid!r}")
+        options = {f"require_{claim}": True for claim in REQUIRED_CLAIMS}
+        claims = self._jwt.decode(token, key=key, algorithms=[algorithm], options=options, leeway=LEEWAY)
+        if claims.get("typ") != typ:
+            raise jwt.InvalidTokenError(f"Expected {typ} token")
+        return claims
+
+    def jwks(self) -> dict:
+        """Открытые ключи для проверки токенов другими сервисами."""
+        return {"keys": [key.jwk() for key in self.keyring.keys.values()]}
+
+    @staticmethod
+    def claims(
+        user_id,
+        role: Optional[str],
+        exp: datetime.timedelta,
+        now: int,
+        login: str = None,
+        sid: str = None,
+        typ: str = ACCESS_TOKEN,
+    ) -> dict:
+        payload = {
+            "exp": now + int(exp.total_seconds()),
+            "iat": now,
+            "nbf": now,
+            "jti": secrets.token_urlsafe(12),
+            "sub": f'"{uuid.UUID(str(user_id)).hex}"',
+            "role": role if role else "user",
+            "typ": typ,
+        }
+        if login is not None:
+            payload["login"] = login
+        if sid is not None:
+            payload["sid"] = sid
+        return payload
+
+    def issue(
+        self,
+        user_id,
+        role: Optional[str],
+        exp: datetime.timedelta,
+        login: str = None,
+        sid: str = None,
+        typ: str = ACCESS_TOKEN,
+    ) -> str:
+        """Один токен типа typ со сроком действия exp."""
+        return self.encode(self.claims(user_id, role, exp, int(time.time()), login, sid, typ))
+
+    def issue_pair(self, user_id, role: Optional[str], login: str = None, sid: str = None) -> dict[str, str]:
+        """Access и refresh токены пользователя с общим временем выпуска."""
+        now = int(time.time())
+        return {
+            "access_token": self.encode(self.claims(user_id, role, ACCESS_TOKEN_TTL, now, login, sid)),
+            "refresh_token": self.encode(self.claims(user_id, role, REFRESH_TOKEN_TTL, now, login, sid, REFRESH_TOKEN)),
+        }
+
+
+tokens = TokenService()
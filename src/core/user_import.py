@@ -0,0 +1,180 @@
+"""Bulk user import"""
+
+import csv
+import io
+import json
+import uuid
+from typing import IO, Iterable, Iterator
+
+from avro.datafile import DataFileReader
+from sqlalchemy import text
+
+from core.db import db
+from core.hashing import PASSWORD_HASHERS, UNUSABLE_PASSWORD, hash_executor, hash_password
+from core.settings import settings
+
+CREATE_STAGING = """
+CREATE TEMPORARY TABLE users_import (
+    row_number integer NOT NULL,
+    id uuid NOT NULL,
+    login varchar NOT NULL,
+    password varchar NOT NULL,
+    email varchar,
+    roles uuid[] NOT NULL
+) ON COMMIT DROP
+"""
+
+COPY_STAGING = "COPY users_import (row_number, id, login, password, email, roles) FROM STDIN WITH (FORMAT csv)"
+
+# Пользователи с занятым id или логином пропускаются, роли назначаются только добавленным
+INSERT_FROM_STAGING = """
+WITH inserted AS (
+    INSERT INTO users (id, login, password, email)
+    SELECT id, login, password, email FROM users_import ORDER BY row_number
+    ON CONFLICT DO NOTHING
+    RETURNING id
+), assigned AS (
+    INSERT INTO association_user_roles (users_id, roles_id)
+    SELECT users_import.id, unnest(users_import.roles)
+    FROM users_import JOIN inserted ON inserted.id = users_import.id
+)
+SELECT id FROM inserted
+"""
+
+
+def ndjson_rows(stream: IO[bytes]) -> Iterator[tuple[int, object]]:
+    """Строки NDJSON: номер строки и JSON-объект или исходная строка, если это не JSON."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, line
+
+
+def avro_rows(reader: DataFileReader) -> Iterator[tuple[int, object]]:
+    """Записи Avro в схеме user_avro_scheme; удаленные пользователи пропускаются."""
+    for number, record in enumerate(reader, 1):
+        if record.get("deleted"):
+            continue
+        yield number, {"id": record["pk"], "login": record["name"], "email": record["email"] or None}
+
+
+class UserImporter:
+    """Загрузка пользователей пачками через COPY во временную таблицу.
+
+    Строка - объект с полями login, id, email, roles (названия ролей) и
+    password либо password_hash в формате хранения. Пароли хешируются в
+    пуле hash_executor; пользователи без пароля получают UNUSABLE_PASSWORD.
+    Каждая пачка - одна транзакция; повтор id или логина внутри пачки -
+    ошибка строки, первая из строк загружается. run() выдает события:
+    ошибки строк {"row", "error"}, прогресс после пачки и итог с "done": true.
+    """
+
+    def __init__(self, role_ids: dict[str, uuid.UUID], batch_size: int = None):
+        self._role_ids = role_ids
+        self._batch_size = batch_size or settings.app.import_batch_size
+        self._totals = {"processed": 0, "imported": 0, "failed": 0}
+
+    def _validate(self, record) -> dict:
+        if not isinstance(record, dict):
+            raise ValueError("row must be a JSON object")
+        login = record.get("login")
+        if not isinstance(login, str) or not login:
+            raise ValueError("login is required")
+        email = record.get("email")
+        if email is not None and not isinstance(email, str):
+            raise ValueError("email must be a string")
+        password, password_hash = record.get("password"), record.get("password_hash")
+        if password is not None and password_hash is not None:
+            raise ValueError("password and password_hash are mutually exclusive")
+        if password is not None and (not isinstance(password, str) or len(password) < 6):
+            raise ValueError("password must have at least 6 symbols")
+        if password_hash is not None and not self._is_stored_hash(password_hash):
+            raise ValueError("unsupported password_hash format")
+        roles = record.get("roles") or []
+        if not isinstance(roles, list) or not all(isinstance(name, str) for name in roles):
+            raise ValueError("roles must be a list of role names")
+        if unknown := [name for name in roles if name not in self._role_ids]:
+            raise ValueError(f"unknown roles: {', '.join(unknown)}")
+        try:
+            user_id = uuid.UUID(record["id"]) if record.get("id") else uuid.uuid4()
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("id must be a UUID")
+        return {
+            "id": user_id,
+            "login": login,
+            "email": email,
+            "password": password,
+            "password_hash": password_hash,
+            "roles": [self._role_ids[name] for name in roles],
+        }
+
+    @staticmethod
+    def _is_stored_hash(value) -> bool:
+        if not isinstance(value, str) or not value.startswith("$"):
+            return False
+        parts = value.split("$")
+        return len(parts) == 5 and parts[1] in PASSWORD_HASHERS
+
+    @property
+    def totals(self) -> dict[str, int]:
+        return dict(self._totals)
+
+    def _load(self, batch: list[tuple[int, dict]]) -> Iterator[dict]:
+        # Иначе вторая строка с тем же id получила бы роли и результат первой
+        ids, logins, unique = set(), set(), []
+        for number, row in batch:
+            if row["id"] in ids or row["login"] in logins:
+                self._totals["processed"] += 1
+                self._totals["failed"] += 1
+                yield {"row": number, "login": row["login"], "error": "duplicate id or login in import"}
+                continue
+            ids.add(row["id"])
+            logins.add(row["login"])
+            unique.append((number, row))
+        batch = unique
+
+        plain = [row for _, row in batch if row["password"] is not None]
+        for row, hashed in zip(plain, hash_executor.map(hash_password, [row["password"] for row in plain])):
+            row["password_hash"] = hashed
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for number, row in batch:
+            roles = "{" + ",".join(str(role_id) for role_id in row["roles"]) + "}"
+            writer.writerow(
+                [number, row["id"], row["login"], row["password_hash"] or UNUSABLE_PASSWORD, row["email"], roles]
+            )
+        buffer.seek(0)
+
+        db.session.execute(text(CREATE_STAGING))
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(COPY_STAGING, buffer)
+        inserted = {str(user_id) for (user_id,) in db.session.execute(text(INSERT_FROM_STAGING))}
+        db.session.commit()
+
+        for number, row in batch:
+            if str(row["id"]) not in inserted:
+                yield {"row": number, "login": row["login"], "error": "user with this id or login already exists"}
+        self._totals["processed"] += len(batch)
+        self._totals["imported"] += len(inserted)
+        self._totals["failed"] += len(batch) - len(inserted)
+        yield self.totals
+
+    def run(self, rows: Iterable[tuple[int, object]]) -> Iterator[dict]:
+        batch = []
+        for number, record in rows:
+            try:
+                batch.append((number, self._validate(record)))
+            except ValueError as err:
+                self._totals["processed"] += 1
+                self._totals["failed"] += 1
+                yield {"row": number, "error": str(err)}
+            if len(batch) >= self._batch_size:
+                yield from self._load(batch)
+                batch = []
+        if batch:
+            yield from self._load(batch)
+        yield {"done": True, **self._totals}
@@ -0,0 +1,66 @@
+"""User directory snapshot"""
+
+import hashlib
+from typing import Callable, Iterable, Optional
+
+from redis.client import Pipeline
+
+from core.redis import redis
+from core.settings import settings
+
+VERSION_KEY = "users:snapshot:version"
+
+
+class UserSnapshotCache:
+    """Готовый Avro-файл справочника пользователей в Redis.
+
+    Снимок строится один раз на версию данных и кодек и хранится под
+    хешем содержимого, который служит ETag. Изменение пользователей
+    увеличивает версию, и следующий запрос строит новый снимок.
+    """
+
+    @staticmethod
+    def _meta_key(codec: str) -> str:
+        version = int(redis.get(VERSION_KEY) or 0)
+        return f"users:snapshot:{version}:{codec}"
+
+    @staticmethod
+    def _blob_key(etag: str) -> str:
+        return f"users:snapshot:blob:{etag}"
+
+    @staticmethod
+    def _read_meta(meta_key: str) -> Optional[dict[str, str]]:
+        meta = redis.hgetall(meta_key)
+        if not meta:
+            return None
+        return {key.decode("utf-8"): value.decode("utf-8") for key, value in meta.items()}
+
+    def meta(self, codec: str) -> Optional[dict[str, str]]:
+        """ETag и watermark актуального снимка или None, если снимка нет."""
+        return self._read_meta(self._meta_key(codec))
+
+    def get(self, codec: str, watermark: Callable[[], int], build: Callable[[], Iterable[bytes]]) -> tuple[dict, bytes]:
+        """Актуальный снимок; строится, если его нет или он вытеснен из Redis."""
+        meta_key = self._meta_key(codec)
+        meta = self._read_meta(meta_key)
+        if meta is not None:
+            blob = redis.get(self._blob_key(meta["etag"]))
+            if blob is not None:
+                return meta, blob
+        meta = {"watermark": str(watermark())}
+        blob = b"".join(build())
+        meta["etag"] = hashlib.sha256(blob).hexdigest()
+        ttl = settings.avro_snapshot_ttl
+        pipeline = redis.pipeline()
+        pipeline.set(self._blob_key(meta["etag"]), blob, ex=ttl)
+        pipeline.hset(meta_key, mapping=meta)
+        pipeline.expire(meta_key, ttl)
+        pipeline.execute()
+        return meta, blob
+
+    def invalidate(self, pipeline: Pipeline = None) -> None:
+        """Пометить снимки устаревшими во всех воркерах."""
+        (redis if pipeline is None else pipeline).incr(VERSION_KEY)
+
+
+user_snapshot = UserSnapshotCache()
@@ -4,6 +4,7 @@ import logging
 
 from core.db import db
 from core.settings import settings
+from core.user_snapshot import user_snapshot
 from models.db_models import Permission, PermissionType, Role, User
 
 
@@ -16,6 +17,7 @@ def add_super_user():
         raise Exception("Не существует роли 'superuser'")
     super_user.roles.append(role)
     db.session.commit()
+    user_snapshot.invalidate()
 
 
 def add_role_superuser():
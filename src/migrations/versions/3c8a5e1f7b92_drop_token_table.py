@@ -0,0 +1,30 @@
+"""drop_token_table
+
+Revision ID: 3c8a5e1f7b92
+Revises: 9e4f0d6a2c17
+Create Date: 2026-10-18 16:20:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8a5e1f7b92'
+down_revision = '9e4f0d6a2c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Отозванные токены хранятся в Redis (core.denylist)
+    op.drop_table('token')
+
+
+def downgrade():
+    op.create_table('token',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('time_created', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expired_time', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
@@ -0,0 +1,29 @@
+"""history_login_dt_index
+
+Revision ID: 5b2e7c91d0a4
+Revises: 8d8503693622
+Create Date: 2026-10-18 10:12:31.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e7c91d0a4'
+down_revision = '8d8503693622'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_history_login_dt_id',
+        'history',
+        ['login', sa.text('dt DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_history_login_dt_id', table_name='history')
@@ -0,0 +1,80 @@
+"""users_change_xid
+
+Revision ID: 9e4f0d6a2c17
+Revises: 5b2e7c91d0a4
+Create Date: 2026-10-18 11:40:05.722913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4f0d6a2c17'
+down_revision = '5b2e7c91d0a4'
+branch_labels = None
+depends_on = None
+
+# Изменение хранит номер своей транзакции, граница выгрузки - xmin снимка
+# (api.route.inter.user): изменение попадает в выгрузку только после коммита.
+USERS_CHANGE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION users_track_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := txid_current();
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION users_track_delete() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO users_deleted (id, login, change_xid, deleted_at)
+    VALUES (OLD.id, OLD.login, txid_current(), now())
+    ON CONFLICT (id) DO UPDATE SET change_xid = EXCLUDED.change_xid, deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_track_change BEFORE UPDATE OF login, email ON users
+    FOR EACH ROW EXECUTE FUNCTION users_track_change();
+
+CREATE TRIGGER users_track_delete AFTER DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION users_track_delete();
+"""
+
+
+def upgrade():
+    op.create_table('users_deleted',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('login', sa.String(), nullable=False),
+    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users_deleted', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_deleted_change_xid'), ['change_xid'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_xid', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+        batch_op.create_index(batch_op.f('ix_users_change_xid'), ['change_xid'], unique=False)
+
+    op.execute(USERS_CHANGE_TRIGGERS)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER users_track_delete ON users')
+    op.execute('DROP TRIGGER users_track_change ON users')
+    op.execute('DROP FUNCTION users_track_delete()')
+    op.execute('DROP FUNCTION users_track_change()')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_change_xid'))
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('change_xid')
+
+    with op.batch_alter_table('users_deleted', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_deleted_change_xid'))
+
+    op.drop_table('users_deleted')
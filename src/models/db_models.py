@@ -1,24 +1,18 @@
 """DB modeles"""
 
-import base64
-import datetime
 import enum
-import json
-import secrets
-import string
 import uuid
+from typing import Optional
 
-import jwt
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
-from pbkdf2 import crypt
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
 from flask_login import UserMixin
 
 from core.db import db
-from core.settings import settings
-from models.uuid_encoder import UUIDEncoder
+from core.hashing import hash_executor, hash_password, verify_password
 
 association_user_roles = db.Table(
     "association_user_roles",
@@ -40,6 +34,9 @@ class User(db.Model, UserMixin):
     login = db.Column(db.String, unique=True, nullable=False)
     password = db.Column(db.String, nullable=False)
     email = db.Column(db.String)
+    # Транзакция последнего изменения экспортируемых полей; триггеры - в миграциях
+    change_xid = db.Column(db.BigInteger, server_default=text("txid_current()"), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     roles = db.relationship("Role", secondary=association_user_roles)
     signin = db.relationship("Login", cascade="all,delete")
 
@@ -49,45 +46,37 @@ class User(db.Model, UserMixin):
 
     @plain_password.setter
     def plain_password(self, plaintext):
-        alphabet = string.ascii_letters + string.digits
-        salt = "".join(
-            secrets.choice(alphabet) for _ in range(settings.app.salt_length)
-        )
-        hpswd = crypt(plaintext, salt, iterations=settings.app.psw_hash_iterations)
-        parts_hpswd = hpswd.split("$")
-        self.password = f"{parts_hpswd[3]}{parts_hpswd[4]}"
+        self.password = hash_executor.run(hash_password, plaintext)
 
     def check_password(self, plaintext):
-        salt = self.password[: settings.app.salt_length]
-        hpswd = crypt(plaintext, salt, iterations=settings.app.psw_hash_iterations)
-        hpswd_db = "$".join(
-            [
-                "",
-                settings.app.kdf_algorithm,
-                f"{settings.app.psw_hash_iterations:x}",
-                salt,
-                self.password[settings.app.salt_length :],
-            ]
-        )
-        return hpswd == hpswd_db
+        valid, needs_rehash = hash_executor.run(verify_password, plaintext, self.password)
+        if needs_rehash:
+            self.plain_password = plaintext
+        return valid
 
     @staticmethod
-    def encode_auth_token(user_id, role, exp):
-        try:
-            payload = {
-                "exp": datetime.datetime.utcnow() + exp,
-                "iat": datetime.datetime.utcnow(),
-                "nbf": datetime.datetime.utcnow(),
-                "sub": json.dumps(user_id, cls=UUIDEncoder),
-                "role": role if role else "user",
-            }
-            return jwt.encode(
-                payload,
-                key=base64.b64decode(settings.app.jwt_secret_key),
-                algorithm="HS256",
-            )
-        except Exception as e:
-            return e
+    def create_if_absent(login: str, plain_password: str) -> Optional[uuid.UUID]:
+        """Добавить пользователя одним INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+        Возвращает id нового пользователя или None, если логин занят.
+        Изменение фиксируется commit-ом вызывающего кода.
+        """
+        statement = (
+            insert(User.__table__)
+            .values(id=uuid.uuid4(), login=login, password=hash_executor.run(hash_password, plain_password))
+            .on_conflict_do_nothing(index_elements=["login"])
+            .returning(User.id)
+        )
+        return db.session.execute(statement).scalar()
+
+
+# Удаленные пользователи остаются в users_deleted с транзакцией удаления
+class DeletedUser(db.Model):
+    __tablename__ = "users_deleted"
+    id = db.Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    login = db.Column(db.String, nullable=False)
+    change_xid = db.Column(db.BigInteger, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
 class Role(db.Model):
@@ -115,12 +104,6 @@ class Permission(db.Model):
     id_role = db.Column(UUID(as_uuid=True), db.ForeignKey("roles.id"))
 
 
-class Token(db.Model):
-    id = db.Column(db.String, nullable=False, primary_key=True)
-    time_created = db.Column(db.DateTime, server_default=func.now())
-    expired_time = db.Column(db.DateTime)
-
-
 class OAuth(OAuthConsumerMixin, db.Model):
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey(User.id))
     provider_user_id = db.Column(db.String)
@@ -1,5 +1,7 @@
 """Login history db model"""
+import re
 import uuid
+from functools import lru_cache
 
 from sqlalchemy import DateTime, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
@@ -8,6 +10,43 @@ from sqlalchemy.sql import func
 from user_agents import parse
 
 from core.db import db
+from core.settings import settings
+
+# Частые семейства User-Agent; тип устройства для них совпадает с результатом user_agents.parse
+FAST_PATH_PATTERNS = (
+    (
+        re.compile(
+            r"Mozilla/5\.0 \(Windows NT [\d.]+; (?:Win64; x64|WOW64)\) AppleWebKit/537\.36 \(KHTML, like Gecko\) "
+            r"Chrome/[\d.]+ Safari/537\.36(?: Edg/[\d.]+)?"
+        ),
+        "web",
+    ),
+    (
+        re.compile(r"Mozilla/5\.0 \(Windows NT [\d.]+; (?:Win64; x64; |WOW64; )?rv:[\d.]+\) Gecko/20100101 Firefox/[\d.]+"),
+        "web",
+    ),
+    (
+        re.compile(
+            r"Mozilla/5\.0 \(Macintosh; Intel Mac OS X [\d_]+\) AppleWebKit/[\d.]+ \(KHTML, like Gecko\) "
+            r"(?:Chrome/[\d.]+ Safari/[\d.]+|Version/[\d.]+ Safari/[\d.]+)"
+        ),
+        "web",
+    ),
+    (
+        re.compile(
+            r"Mozilla/5\.0 \(iPhone; CPU iPhone OS [\d_]+ like Mac OS X\) AppleWebKit/[\d.]+ \(KHTML, like Gecko\) "
+            r"(?:Version|CriOS)/[\d.]+ Mobile/\w+ Safari/[\d.]+"
+        ),
+        "mobile",
+    ),
+    (
+        re.compile(
+            r"Mozilla/5\.0 \(Linux; Android [\d.]+; [\w .-]+\) AppleWebKit/537\.36 \(KHTML, like Gecko\) "
+            r"Chrome/[\d.]+ Mobile Safari/537\.36"
+        ),
+        "mobile",
+    ),
+)
 
 
 def create_partition(target, connection, **kw) -> None:
@@ -23,6 +62,32 @@ def create_partition(target, connection, **kw) -> None:
     )
 
 
+def parse_device_type(plaintext: str) -> str:
+    """Тип устройства полным разбором User-Agent."""
+    try:
+        user_agent = parse(plaintext)
+    except KeyError:
+        return "error"
+    if user_agent.is_mobile:
+        return "mobile"
+    if user_agent.is_pc:
+        return "web"
+    return "other"
+
+
+@lru_cache(maxsize=settings.history.user_agent_cache_size)
+def device_type(plaintext: str) -> str:
+    """Тип устройства (партиция истории) по User-Agent.
+
+    Результат кешируется, попадания и промахи - device_type.cache_info().
+    """
+    if settings.history.user_agent_fast_path:
+        for pattern, kind in FAST_PATH_PATTERNS:
+            if pattern.fullmatch(plaintext):
+                return kind
+    return parse_device_type(plaintext)
+
+
 class Login(db.Model):
     __tablename__ = "history"
     __table_args__ = (
@@ -48,18 +113,11 @@ class Login(db.Model):
     @raw_user_agent.setter
     def raw_user_agent(self, plaintext):
         self.user_agent = plaintext
-        try:
-            user_agent = parse(plaintext)
-        except KeyError:
-            self.user_device_type = "error"
-        else:
-            if user_agent.is_mobile:
-                self.user_device_type = "mobile"
-            elif user_agent.is_pc:
-                self.user_device_type = "web"
-            else:
-                self.user_device_type = "other"
+        self.user_device_type = device_type(plaintext)
 
     def __repr__(self):
         return f"<UserSignIn {self.user_id}:{self.logged_in_at }>"
 
+
+# Выборка истории пользователя по курсору (login, dt, id) без сортировки
+db.Index("ix_history_login_dt_id", Login.login, Login.dt.desc(), Login.id.desc())
@@ -1,6 +1,7 @@
 """Базовый класс корзины, используемой для ограничения запросов."""
 import logging
 from abc import ABC, abstractmethod
+from typing import Sequence
 
 
 class AbstractBucket(ABC):
@@ -50,3 +51,16 @@ class AbstractBucket(ABC):
                 break
 
         return item_count, remaining_time
+
+
+class AbstractAtomicBucket(AbstractBucket):
+    """Корзина, выполняющая проверку и добавление запроса одной операцией."""
+
+    @abstractmethod
+    def acquire(self, rates: Sequence[int]) -> tuple[int, float]:
+        """Занять место в корзине.
+
+        Возвращает превышенную частоту (0, если запрос разрешен)
+        и время до освобождения места.
+        """
+        pass
@@ -0,0 +1,60 @@
+"""Локальная корзина воркера, арендующая места в Redis пачками."""
+
+from time import monotonic
+from typing import Sequence
+
+from rate_limiter.sliding_window_bucket import SlidingWindowBucket
+
+
+class LeaseBucket(SlidingWindowBucket):
+    """Двухуровневая корзина.
+
+    Воркер занимает в общей корзине Redis сразу несколько мест (аренду)
+    и выдает их запросам из памяти, обращаясь к Redis только когда аренда
+    исчерпана или истекло окно. После отказа Redis воркер отказывает
+    локально до освобождения места.
+
+    Размер аренды равен доле tolerance от частоты, но не меньше min_lease
+    и не больше самой частоты: при малых частотах (5 в секунду при
+    tolerance 0.1) аренда из одного места обращалась бы к Redis на каждый
+    запрос. Погрешность лимита в любом окне не превышает размера аренды
+    на каждый воркер, поэтому при малых частотах ее задает min_lease.
+    """
+
+    def __init__(self, maxsize=10, tolerance: float = 0.1, min_lease: int = 2, **kwargs):
+        super().__init__(maxsize=maxsize, **kwargs)
+        self._tolerance = tolerance
+        self._min_lease = min_lease
+        self._tokens = 0
+        self._expires_at = 0.0
+        self._blocked_until = 0.0
+        self._blocked_rate = 0
+
+    def lease_size(self, rates: Sequence[int]) -> int:
+        """Число мест, занимаемых в Redis за одно обращение."""
+        return min(rates[0], max(self._min_lease, int(rates[0] * self._tolerance)))
+
+    def acquire(self, rates: Sequence[int]) -> tuple[int, float]:
+        now = monotonic()
+        if now < self._blocked_until:
+            return self._blocked_rate, self._blocked_until - now
+        if self._tokens and now < self._expires_at:
+            self._tokens -= 1
+            return 0, 0.0
+
+        granted, rate, remaining_time = self.reserve(rates, self.lease_size(rates))
+        if not granted:
+            self._tokens = 0
+            self._blocked_until = now + remaining_time
+            self._blocked_rate = rate
+            return rate, remaining_time
+
+        # Места в Redis истекают через окно от момента аренды
+        self._tokens = granted - 1
+        self._expires_at = now + self._window
+        return 0, 0.0
+
+    def flush(self):
+        self._tokens = 0
+        self._blocked_until = 0.0
+        super().flush()
@@ -3,6 +3,7 @@
 from time import monotonic
 from typing import Callable, Generic, TypeVar, Union
 
+from rate_limiter.bucket import AbstractAtomicBucket
 from rate_limiter.decorator import LimitDecorator
 from rate_limiter.exceptions import BucketFullException, InvalidParams
 
@@ -40,9 +41,13 @@ class Limiter(Generic[T]):
             if invalid:
                 raise InvalidParams(f"{prev_rate} cannot come before {rate}")
 
+    def _bucket_type(self) -> type:
+        """Тип корзины."""
+        return self.__orig_class__.__args__[0]
+
     def _init_buckets(self, identities) -> None:
         """Инициализация корзины."""
-        typ = self.__orig_class__.__args__[0]
+        typ = self._bucket_type()
         maxsize = self._rates[-1]
         for identity in sorted(identities):
             if not self.bucket_group.get(identity):
@@ -53,6 +58,8 @@ class Limiter(Generic[T]):
     def try_acquire(self, *identities: str) -> None:
         """Проверка на выполнение запроса."""
         self._init_buckets(identities)
+        if issubclass(self._bucket_type(), AbstractAtomicBucket):
+            return self._try_acquire_atomic(identities)
         now = self.time_function()
 
         for rate in self._rates:
@@ -75,6 +82,13 @@ class Limiter(Generic[T]):
         for identity in identities:
             self.bucket_group[identity].put(now)
 
+    def _try_acquire_atomic(self, identities) -> None:
+        """Проверка и добавление запроса в корзины за одну операцию на корзину."""
+        for identity in identities:
+            rate, remaining_time = self.bucket_group[identity].acquire(self._rates)
+            if rate:
+                raise BucketFullException(identity, rate, remaining_time)
+
     def ratelimit(
         self,
         *identities: str,
@@ -0,0 +1,114 @@
+"""Корзина со скользящим окном в Redis, проверяемая одним Lua-скриптом."""
+
+import uuid
+from typing import Sequence
+
+from core.redis import redis
+
+from rate_limiter.bucket import AbstractAtomicBucket
+from rate_limiter.exceptions import InvalidParams
+
+# KEYS[1] - корзина
+# ARGV[1] - длина окна в секундах, ARGV[2] - запрошенное число мест,
+# ARGV[3] - уникальный префикс запроса, ARGV[4..] - частоты по возрастанию
+# Время берется с сервера Redis, чтобы окна всех воркеров совпадали.
+ACQUIRE_SCRIPT = """
+local window = tonumber(ARGV[1])
+local granted = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+for i = 4, #ARGV do
+    local rate = tonumber(ARGV[i])
+    if count >= rate then
+        local oldest = redis.call('ZRANGE', KEYS[1], count - rate, count - rate, 'WITHSCORES')
+        return {0, rate, tostring(tonumber(oldest[2]) + window - now)}
+    end
+    granted = math.min(granted, rate - count)
+end
+for i = 1, granted do
+    redis.call('ZADD', KEYS[1], now, ARGV[3] .. ':' .. i)
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return {granted, 0, '0'}
+"""
+
+
+class SlidingWindowBucket(AbstractAtomicBucket):
+    """Корзина в отсортированном множестве Redis.
+
+    Проверка лимита и добавление запроса выполняются атомарно
+    на сервере за один запрос к Redis.
+    """
+
+    _acquire_script = None
+
+    def __init__(
+        self,
+        maxsize=10,
+        bucket_name: str = "rate_limit",
+        identity: str = None,
+        window: float = 1.0,
+        **kwargs,
+    ):
+        super().__init__(maxsize=maxsize)
+
+        if not bucket_name or not isinstance(bucket_name, str):
+            raise InvalidParams(
+                "keyword argument bucket-name is missing: a distinct name is required"
+            )
+
+        self._bucket_name = f"{bucket_name}___{identity}"
+        self._window = window
+
+    def get_connection(self):
+        """Соединение с Redis."""
+        return redis
+
+    @classmethod
+    def get_script(cls, connection):
+        """Зарегистрированный скрипт проверки лимита."""
+        if cls._acquire_script is None:
+            cls._acquire_script = connection.register_script(ACQUIRE_SCRIPT)
+        return cls._acquire_script
+
+    def reserve(self, rates: Sequence[int], number: int) -> tuple[int, int, float]:
+        """Занять до number мест в корзине.
+
+        Возвращает число занятых мест, превышенную частоту
+        и время до освобождения места.
+        """
+        script = self.get_script(self.get_connection())
+        granted, rate, remaining_time = script(
+            keys=[self._bucket_name],
+            args=[self._window, number, uuid.uuid4().hex, *rates],
+        )
+        return int(granted), int(rate), float(remaining_time)
+
+    def acquire(self, rates: Sequence[int]) -> tuple[int, float]:
+        _, rate, remaining_time = self.reserve(rates, 1)
+        return rate, remaining_time
+
+    def size(self) -> int:
+        conn = self.get_connection()
+        return conn.zcard(self._bucket_name)
+
+    def put(self, item: float) -> int:
+        conn = self.get_connection()
+        if conn.zcard(self._bucket_name) < self.maxsize():
+            conn.zadd(self._bucket_name, {uuid.uuid4().hex: item})
+            return 1
+        return 0
+
+    def get(self, number: int) -> int:
+        conn = self.get_connection()
+        return len(conn.zpopmin(self._bucket_name, number))
+
+    def all_items(self) -> list[float]:
+        conn = self.get_connection()
+        return [score for _, score in conn.zrange(self._bucket_name, 0, -1, withscores=True)]
+
+    def flush(self):
+        conn = self.get_connection()
+        conn.delete(self._bucket_name)
@@ -0,0 +1,51 @@
+"""Unittest"""
+
+import unittest
+
+from models.login_history import FAST_PATH_PATTERNS, device_type, parse_device_type
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36 "
+    "Edg/118.0.2088.46",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/118.0",
+    "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:52.0) Gecko/20100101 Firefox/52.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 "
+    "Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 "
+    "Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 "
+    "Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "CriOS/118.0.5993.69 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 "
+    "Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 "
+    "Mobile/15E148 Safari/604.1",
+    "curl/8.1.2",
+    "python-requests/2.28.1",
+]
+
+
+class TestDeviceType(unittest.TestCase):
+    def test_fast_path_matches_full_parser(self):
+        for user_agent in USER_AGENTS:
+            for pattern, kind in FAST_PATH_PATTERNS:
+                if pattern.fullmatch(user_agent):
+                    self.assertEqual(kind, parse_device_type(user_agent), user_agent)
+            self.assertEqual(device_type(user_agent), parse_device_type(user_agent), user_agent)
+
+    def test_repeated_user_agent_is_cached(self):
+        device_type.cache_clear()
+        for _ in range(3):
+            for user_agent in USER_AGENTS:
+                device_type(user_agent)
+        info = device_type.cache_info()
+        self.assertEqual(info.misses, len(USER_AGENTS))
+        self.assertEqual(info.hits, 2 * len(USER_AGENTS))
+
+
+if __name__ == "__name__":
+    unittest.main()
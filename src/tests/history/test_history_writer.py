@@ -0,0 +1,40 @@
+"""Unittest"""
+
+import unittest
+
+from app import app
+from core.history_writer import GROUP_NAME, STREAM_KEY, history_writer
+from core.redis import redis
+from core.settings import settings
+
+
+class TestHistoryWriter(unittest.TestCase):
+    def setUp(self):
+        history_writer.drain()
+        self.history_settings = settings.history.copy()
+        settings.history.claim_idle_time = 0
+        with app.app_context():
+            history_writer._create_group()
+
+    def tearDown(self):
+        settings.history = self.history_settings
+
+    def test_claim_skips_deleted_entries(self):
+        deleted = redis.xadd(STREAM_KEY, {"id": "deleted"})
+        kept = redis.xadd(STREAM_KEY, {"id": "kept"})
+        # Упавший воркер прочитал оба события, одно из них удалено до XAUTOCLAIM
+        redis.xreadgroup(GROUP_NAME, "crashed-worker", {STREAM_KEY: ">"})
+        redis.xdel(STREAM_KEY, deleted)
+        try:
+            claimed = history_writer._read(10)
+            self.assertEqual(claimed, [(kept, {b"id": b"kept"})])
+            pending = redis.xpending_range(STREAM_KEY, GROUP_NAME, "-", "+", 10)
+            self.assertEqual([entry["message_id"] for entry in pending], [kept])
+        finally:
+            redis.xack(STREAM_KEY, GROUP_NAME, deleted, kept)
+            redis.xdel(STREAM_KEY, kept)
+            redis.xgroup_delconsumer(STREAM_KEY, GROUP_NAME, "crashed-worker")
+
+
+if __name__ == "__name__":
+    unittest.main()
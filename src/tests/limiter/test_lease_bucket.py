@@ -0,0 +1,105 @@
+"""Unittest"""
+
+import unittest
+import uuid
+from time import monotonic
+
+from api.route.decorators import rate_limit, rates
+from app import app
+from core.principal import TokenPrincipal
+from core.redis import redis
+from core.settings import settings
+from rate_limiter.exceptions import BucketFullException
+from rate_limiter.lease_bucket import LeaseBucket
+from rate_limiter.limiter import Limiter
+from rate_limiter.sliding_window_bucket import ACQUIRE_SCRIPT
+from tests.route.query_budget import count_redis_round_trips
+
+RATE = 100
+WORKERS = 2
+DURATION = 3
+
+
+class CountingLeaseBucket(LeaseBucket):
+    reserve_calls = 0
+
+    def reserve(self, rates, number):
+        CountingLeaseBucket.reserve_calls += 1
+        return super().reserve(rates, number)
+
+
+class TestLeaseBucket(unittest.TestCase):
+    def setUp(self):
+        self.identity = f"lease-test-{uuid.uuid4().hex}"
+        self.tolerance = settings.limiter_tolerance
+        self.workers = [
+            Limiter[CountingLeaseBucket](
+                RATE, bucket_kwargs={"tolerance": self.tolerance, "min_lease": settings.limiter_min_lease}
+            )
+            for _ in range(WORKERS)
+        ]
+        CountingLeaseBucket.reserve_calls = 0
+
+    def tearDown(self):
+        for limiter in self.workers:
+            limiter.flush_all()
+
+    def flood(self) -> list[float]:
+        """Запросы от всех воркеров по очереди; время разрешенных запросов."""
+        granted = []
+        start = monotonic()
+        while (now := monotonic()) - start < DURATION:
+            for limiter in self.workers:
+                try:
+                    limiter.try_acquire(self.identity)
+                except BucketFullException:
+                    continue
+                granted.append(now - start)
+        return granted
+
+    def test_accuracy_within_tolerance(self):
+        granted = self.flood()
+        lease = self.workers[0].bucket_group[self.identity].lease_size([RATE])
+        allowed_error = WORKERS * lease
+        for second in range(DURATION):
+            count = len([moment for moment in granted if second <= moment < second + 1])
+            self.assertLessEqual(abs(count - RATE), allowed_error, f"second {second}: {count} requests")
+
+    def test_redis_traffic(self):
+        granted = self.flood()
+        self.assertTrue(granted)
+        self.assertLessEqual(CountingLeaseBucket.reserve_calls * 5, len(granted))
+
+
+class TestRateLimitDecorator(unittest.TestCase):
+    def setUp(self):
+        self.disable_limiter = settings.disable_limiter
+        settings.disable_limiter = False
+        self.user_id = str(uuid.uuid4())
+        # Скрипт загружен заранее: EVALSHA не повторяется после NOSCRIPT
+        redis.script_load(ACQUIRE_SCRIPT)
+
+    def tearDown(self):
+        settings.disable_limiter = self.disable_limiter
+        for limiter in rates.values():
+            limiter.flush_all()
+
+    def test_requests_share_lease(self):
+        requests = 4
+        # Как и в запросах, пользователь каждый раз - новый объект
+        endpoint = rate_limit(5, get_user=lambda: TokenPrincipal(self.user_id, "user", []))(lambda: None)
+        with count_redis_round_trips() as commands:
+            for _ in range(requests):
+                endpoint()
+        bucket = rates[5].bucket_group[self.user_id]
+        lease = bucket.lease_size([5])
+        self.assertGreater(lease, 1)
+        packed = [command if isinstance(command, bytes) else b"".join(command) for command in commands]
+        self.assertEqual(len(packed), -(-requests // lease))
+        self.assertTrue(all(f"rate_limit___{self.user_id}".encode() in command for command in packed))
+
+        rate_limit(5, get_user=lambda: None)(lambda: None)()
+        self.assertIn("anonymous", rates[5].bucket_group)
+
+if __name__ == "__name__":
+    unittest.main()
@@ -0,0 +1,13 @@
+"""Общие данные тестов маршрутов"""
+
+from app import app
+from core.settings import settings
+from core.tokens import ACCESS_TOKEN_TTL, tokens
+from models.db_models import User
+
+
+def superuser_token() -> str:
+    """Access-токен суперпользователя из настроек для вызова /api/admin."""
+    with app.app_context():
+        superuser = User.query.filter_by(login=settings.superuser.username).one()
+        return tokens.issue(superuser.id, "superuser", ACCESS_TOKEN_TTL, login=superuser.login)
@@ -0,0 +1,54 @@
+"""Подсчет SQL-запросов и обращений к Redis в тестах"""
+
+import threading
+from contextlib import contextmanager
+
+from redis.connection import Connection
+from sqlalchemy import event
+
+from app import app
+from core.db import db
+
+
+@contextmanager
+def count_queries():
+    """Список SQL-запросов, выполненных в текущем потоке внутри блока.
+
+    Запросы фоновых потоков (например, записи истории входов) не учитываются.
+    """
+    statements = []
+    thread_id = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread_id:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def count_redis_round_trips():
+    """Список отправок в Redis из текущего потока внутри блока.
+
+    Одна команда или целый pipeline - одна отправка.
+    """
+    commands = []
+    thread_id = threading.get_ident()
+    send_packed_command = Connection.send_packed_command
+
+    def counted(connection, command, *args, **kwargs):
+        if threading.get_ident() == thread_id:
+            commands.append(command)
+        return send_packed_command(connection, command, *args, **kwargs)
+
+    Connection.send_packed_command = counted
+    try:
+        yield commands
+    finally:
+        Connection.send_packed_command = send_packed_command
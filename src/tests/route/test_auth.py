@@ -9,7 +9,11 @@ import unittest
 import jwt
 
 from app import app
+from core.db import db
+from core.history_writer import history_writer
 from core.settings import settings
+from core.tokens import tokens
+from models.db_models import Role, User
 
 alphabet = string.ascii_letters + string.digits
 login = "".join(secrets.choice(alphabet) for _ in range(6))
@@ -39,8 +43,15 @@ class TestUsers(unittest.TestCase):
                 data["access_token"], key=base64.b64decode(settings.app.jwt_secret_key), algorithms=["HS256"]
             )
             self.assertTrue(payload["role"] == "user")
+            self.assertEqual(payload["login"], login)
             self.assertTrue(response.content_type == "application/json")
             self.assertEqual(response.status_code, 201)
+            response = self.client.post(
+                "api/users/register",
+                data=json.dumps(dict(login=login, password=password)),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
 
     def step_02_login_correct(self):
         with self.client:
@@ -86,9 +97,30 @@ class TestUsers(unittest.TestCase):
                 content_type="application/json",
             )
             self.assertEqual(response.status_code, 200)
+            # Access-токен не обменивается, refresh-токен не принимается вместо access
+            response = self.client.post("api/users/refresh", data=access_token)
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get(
+                "api/users/history/1",
+                headers={"Authorization": "JWT " + refresh_token},
+            )
+            self.assertEqual(response.status_code, 401)
+        # Роль, выданная после логина, попадает в токен при обновлении
+        with self.app.app_context():
+            user = User.query.filter_by(login=login).one()
+            user.roles = [Role.query.filter_by(name="superuser").one()]
+            db.session.commit()
+        try:
+            response = self.client.post("api/users/refresh", data=refresh_token)
+            self.assertEqual(tokens.decode(response.json["access_token"])["role"], "superuser")
+        finally:
+            with self.app.app_context():
+                User.query.filter_by(login=login).one().roles = []
+                db.session.commit()
 
     def step_06_login_history(self):
         global access_token
+        history_writer.drain()
         with self.client:
             response = self.client.get(
                 "api/users/history/1",
@@ -100,6 +132,23 @@ class TestUsers(unittest.TestCase):
             logins = data["logins"]
             self.assertTrue(len(logins) > 0)
 
+            response = self.client.get(
+                "api/users/history?limit=1&count=true",
+                headers={"Authorization": "JWT " + access_token, },
+            )
+            self.assertEqual(response.status_code, 200)
+            first_page = json.loads(response.data.decode())
+            self.assertEqual(len(first_page["logins"]), 1)
+            self.assertTrue(first_page["total"] > 1)
+            response = self.client.get(
+                "api/users/history?limit=1&cursor=" + first_page["next_cursor"],
+                headers={"Authorization": "JWT " + access_token, },
+            )
+            self.assertEqual(response.status_code, 200)
+            second_page = json.loads(response.data.decode())
+            self.assertNotIn("total", second_page)
+            self.assertTrue(second_page["logins"][0]["dt"] <= first_page["logins"][0]["dt"])
+
     def step_07_logout(self):
         global access_token
         with self.client:
@@ -109,6 +158,14 @@ class TestUsers(unittest.TestCase):
                 content_type="application/json",
             )
             self.assertEqual(response.status_code, 201)
+            response = self.client.post(
+                "api/users/refresh",
+                data=refresh_token,
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get("api/users/history", headers={"Authorization": "JWT " + access_token})
+            self.assertEqual(response.status_code, 401)
 
     def steps(self):
         for name in sorted(dir(self)):
@@ -1,8 +1,17 @@
+import io
+import secrets
 import unittest
 from avro.datafile import DataFileReader
 from avro.io import DatumReader
+from sqlalchemy import text
 from app import app
+from core.db import db
+from core.permission_cache import permission_cache
+from core.sessions import sessions
 from core.settings import settings
+from core.tokens import ACCESS_TOKEN_TTL, tokens
+from core.user_snapshot import user_snapshot
+from models.db_models import User
 
 
 class TestUsersInterract(unittest.TestCase):
@@ -24,6 +33,115 @@ class TestUsersInterract(unittest.TestCase):
             superuser = users_by_dict[settings.superuser.username]
             self.assertEqual(settings.superuser.email, superuser['email'])
 
+    def test_changes(self):
+        response = self.client.get("/api/inter/user/")
+        response.close()
+        watermark = int(response.headers["X-Export-Watermark"])
+        email = secrets.token_hex(4)
+        with app.app_context():
+            user = User.query.filter_by(login=settings.superuser.username).first()
+            user.email = email
+            db.session.commit()
+        try:
+            response = self.client.get(f"/api/inter/user/changes?since={watermark}")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(int(response.headers["X-Export-Watermark"]) > watermark)
+            users = list(DataFileReader(io.BytesIO(response.data), DatumReader()))
+            self.assertEqual(
+                [(user_data["name"], user_data["email"], user_data["deleted"]) for user_data in users],
+                [(settings.superuser.username, email, False)],
+            )
+        finally:
+            with app.app_context():
+                user = User.query.filter_by(login=settings.superuser.username).first()
+                user.email = settings.superuser.email or None
+                db.session.commit()
+            user_snapshot.invalidate()
+
+    def test_changes_wait_for_open_transactions(self):
+        login = settings.superuser.username
+        with app.app_context():
+            connection = db.engine.connect()
+        try:
+            with connection.begin():
+                xid = connection.execute(text("SELECT txid_current()")).scalar()
+                connection.execute(
+                    text("UPDATE users SET email = :email WHERE login = :login"), email="open@example.com", login=login
+                )
+                response = self.client.get("/api/inter/user/changes")
+                response.close()
+                watermark = int(response.headers["X-Export-Watermark"])
+                # Граница не проходит незавершенную транзакцию
+                self.assertLessEqual(watermark, xid)
+            response = self.client.get(f"/api/inter/user/changes?since={watermark}")
+            users = list(DataFileReader(io.BytesIO(response.data), DatumReader()))
+            response.close()
+            self.assertIn((login, "open@example.com"), [(user_data["name"], user_data["email"]) for user_data in users])
+        finally:
+            connection.close()
+            with app.app_context():
+                user = User.query.filter_by(login=login).first()
+                user.email = settings.superuser.email or None
+                db.session.commit()
+
+    def test_snapshot_not_modified(self):
+        response = self.client.get("/api/inter/user/")
+        etag = response.headers["ETag"]
+        response = self.client.get("/api/inter/user/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        # Пересобранный снимок тех же данных сохраняет ETag
+        user_snapshot.invalidate()
+        response = self.client.get("/api/inter/user/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["ETag"], etag)
+        response = self.client.get("/api/inter/user/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        with app.app_context():
+            user = User.query.filter_by(login=settings.superuser.username).first()
+            user.email = "snapshot@example.com"
+            db.session.commit()
+        try:
+            user_snapshot.invalidate()
+            response = self.client.get("/api/inter/user/", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["ETag"], etag)
+        finally:
+            with app.app_context():
+                user = User.query.filter_by(login=settings.superuser.username).first()
+                user.email = settings.superuser.email or None
+                db.session.commit()
+            user_snapshot.invalidate()
+
+    def test_introspect(self):
+        with app.app_context():
+            superuser = User.query.filter_by(login=settings.superuser.username).first()
+            user_id = superuser.id
+            sid = sessions.create(user_id)
+            token = tokens.issue(user_id, "superuser", ACCESS_TOKEN_TTL, login=superuser.login, sid=sid)
+            refresh_token = tokens.issue_pair(user_id, "superuser", sid=sid)["refresh_token"]
+            permissions = sorted(permission_cache.role_permissions(role.id for role in superuser.roles))
+        response = self.client.post("/api/inter/token/introspect", json={"tokens": [token, "garbage", refresh_token]})
+        self.assertEqual(response.status_code, 200)
+        active, invalid, refresh = response.json["results"]
+        self.assertEqual(invalid, {"active": False})
+        self.assertEqual(refresh, {"active": False})
+        self.assertTrue(active["active"])
+        self.assertEqual(active["sub"], user_id.hex)
+        self.assertEqual(active["roles"], ["superuser"])
+        self.assertEqual(active["permissions"], permissions)
+
+        sessions.revoke(user_id, sid)
+        response = self.client.post("/api/inter/token/introspect", json={"tokens": [token]})
+        self.assertEqual(response.json["results"], [{"active": False}])
+        response = self.client.post("/api/inter/token/introspect", json={"tokens": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_codec(self):
+        with self.client:
+            response = self.client.get("/api/inter/user/?codec=unknown")
+            self.assertEqual(response.status_code, 400)
+
 
 
 if __name__ == "__name__":
@@ -0,0 +1,229 @@
+"""Unittest"""
+
+import json
+import secrets
+import unittest
+from time import perf_counter
+
+from api.route.decorators import rates
+from app import app
+from core.db import db
+from core.denylist import token_denylist
+from core.history_writer import history_writer
+from core.permission_cache import permission_cache
+from core.redis import redis
+from core.settings import settings
+from core.user_snapshot import user_snapshot
+from models.db_models import Role, User
+
+from .fixtures import superuser_token
+from .query_budget import count_queries, count_redis_round_trips
+
+ROLES_COUNT = 5
+BLUEPRINTS = ("users", "inter_user", "inter_token", "jwks", "admin_role", "admin_user", "admin_permission")
+
+# Предельное число SQL-запросов на один вызов каждого эндпоинта
+QUERY_BUDGETS = {
+    "users.register": 1,
+    "users.login": 2,
+    "users.refresh": 1,
+    "users.update_user": 3,
+    "users.login_history": 2,
+    "users.login_history_cursor": 2,
+    "users.test": 0,
+    "users.logout": 0,
+    "users.logout_all": 0,
+    "inter_user.user_avro": 3,
+    "inter_user.user_avro_changes": 4,
+    "inter_token.introspect": 0,
+    "jwks.get_jwks": 0,
+    "admin_role.get_roles": 2,
+    "admin_role.get_role": 2,
+    "admin_role.create_role": 1,
+    "admin_role.update_role": 2,
+    "admin_role.delete_role": 4,
+    "admin_user.user_role_update": 5,
+    "admin_user.users_roles_update": 5,
+    "admin_user.user_import": 4,
+    "admin_permission.get_permissions": 0,
+}
+
+# Предельное число обращений к Redis (команда или pipeline) на один вызов
+REDIS_BUDGETS = {
+    "users.register": 1,
+    "users.login": 1,
+    "users.refresh": 1,
+    "users.update_user": 0,
+    "users.login_history": 0,
+    "users.login_history_cursor": 0,
+    "users.test": 1,
+    "users.logout": 1,
+    "users.logout_all": 2,
+    "inter_user.user_avro": 5,
+    "inter_user.user_avro_changes": 0,
+    "inter_token.introspect": 2,
+    "jwks.get_jwks": 0,
+    "admin_role.get_roles": 0,
+    "admin_role.get_role": 0,
+    "admin_role.create_role": 0,
+    "admin_role.update_role": 1,
+    "admin_role.delete_role": 1,
+    "admin_user.user_role_update": 1,
+    "admin_user.users_roles_update": 1,
+    "admin_user.user_import": 1,
+    "admin_permission.get_permissions": 0,
+}
+
+# Грубый предел задержки одного запроса: ловит зависания и N+1, а не колебания
+LATENCY_BUDGET = 2.0
+
+
+class TestQueryBudget(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        # /test ограничен rate_limit: его обращение к Redis входит в бюджет
+        self.disable_limiter = settings.disable_limiter
+        settings.disable_limiter = False
+        self.prefix = f"budget-{secrets.token_hex(4)}"
+        self.password = secrets.token_hex(8)
+        self.admin_token = superuser_token()
+        with app.app_context():
+            roles = [Role(name=f"{self.prefix}-{number}") for number in range(ROLES_COUNT)]
+            user = User(login=self.prefix, password="!")
+            user.plain_password = self.password
+            # Роли с разрешениями: вход и обновление токена загружают их, как у настоящих пользователей
+            user.roles = [Role(name=f"{self.prefix}-member"), Role.query.filter_by(name="superuser").one()]
+            db.session.add_all([*roles, user])
+            db.session.commit()
+            self.role_ids = [str(role.id) for role in roles]
+            self.user_id = str(user.id)
+        response = self.client.post("/api/users/login", json={"login": self.prefix, "password": self.password})
+        self.access_token = response.json["access_token"]
+        self.refresh_token = response.json["refresh_token"]
+        response = self.client.post("/api/users/login", json={"login": self.prefix, "password": self.password})
+        self.other_access_token = response.json["access_token"]
+
+    def tearDown(self):
+        settings.disable_limiter = self.disable_limiter
+        for limiter in rates.values():
+            limiter.flush_all()
+        history_writer.drain()
+        with app.app_context():
+            for user in User.query.filter(User.login.startswith(self.prefix)).all():
+                user.roles = []
+                db.session.delete(user)
+            for role in Role.query.filter(Role.name.startswith(self.prefix)).all():
+                db.session.delete(role)
+            db.session.commit()
+            permission_cache.invalidate()
+            user_snapshot.invalidate()
+
+    def requests(self):
+        """Вызов каждого эндпоинта: метод, URL, токен и аргументы тестового клиента.
+
+        Вызовы выполняются по порядку: после выхода токен отозван, поэтому
+        выход из всех сессий идет с токеном второй сессии.
+        """
+        user = {"Authorization": "JWT " + self.access_token}
+        admin = {"Authorization": "JWT " + self.admin_token}
+        return {
+            "users.register": (
+                "POST",
+                "/api/users/register",
+                {"json": {"login": f"{self.prefix}-new", "password": self.password}},
+            ),
+            "users.login": ("POST", "/api/users/login", {"json": {"login": self.prefix, "password": self.password}}),
+            "users.refresh": ("POST", "/api/users/refresh", {"data": self.refresh_token}),
+            "users.update_user": ("PUT", "/api/users/profile", {"headers": user, "json": {"password": self.password}}),
+            "users.login_history": ("GET", "/api/users/history/1", {"headers": user}),
+            "users.login_history_cursor": ("GET", "/api/users/history?count=true", {"headers": user}),
+            "users.test": ("GET", "/api/users/test", {}),
+            "users.logout": ("POST", "/api/users/logout", {"headers": user}),
+            "users.logout_all": (
+                "POST",
+                "/api/users/logout-all",
+                {"headers": {"Authorization": "JWT " + self.other_access_token}},
+            ),
+            "inter_user.user_avro": ("GET", "/api/inter/user/", {}),
+            "inter_user.user_avro_changes": ("GET", "/api/inter/user/changes", {}),
+            "inter_token.introspect": (
+                "POST",
+                "/api/inter/token/introspect",
+                {"json": {"tokens": [self.access_token, self.refresh_token, self.admin_token]}},
+            ),
+            "jwks.get_jwks": ("GET", "/.well-known/jwks.json", {}),
+            "admin_role.get_roles": ("GET", "/api/admin/role/", {"headers": admin}),
+            "admin_role.get_role": ("GET", f"/api/admin/role/{self.role_ids[0]}", {"headers": admin}),
+            "admin_role.create_role": (
+                "POST",
+                "/api/admin/role/",
+                {"headers": admin, "data": {"name": f"{self.prefix}-new"}},
+            ),
+            "admin_role.update_role": ("PUT", f"/api/admin/role/{self.role_ids[1]}", {"headers": admin, "json": []}),
+            "admin_role.delete_role": ("DELETE", f"/api/admin/role/{self.role_ids[2]}", {"headers": admin}),
+            "admin_user.user_role_update": (
+                "PUT",
+                f"/api/admin/user/{self.user_id}/role/",
+                {"headers": admin, "json": self.role_ids[3:]},
+            ),
+            "admin_user.users_roles_update": (
+                "PUT",
+                "/api/admin/user/roles/",
+                {"headers": admin, "json": {"users": [self.user_id], "roles": self.role_ids[4:]}},
+            ),
+            "admin_user.user_import": (
+                "POST",
+                "/api/admin/user/import",
+                {
+                    "headers": admin,
+                    "data": json.dumps({"login": f"{self.prefix}-imported", "password_hash": "$scrypt$n=2,r=1,p=1$a$b"}),
+                    "content_type": "application/x-ndjson",
+                },
+            ),
+            "admin_permission.get_permissions": ("GET", "/api/admin/permission/", {"headers": admin}),
+        }
+
+    def test_every_admin_endpoint_has_budget(self):
+        endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.rule.startswith("/api/admin/")}
+        self.assertLessEqual(endpoints, set(QUERY_BUDGETS))
+        self.assertLessEqual(endpoints, set(self.requests()))
+
+    def test_every_endpoint_has_budget(self):
+        endpoints = {
+            rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.split(".")[0] in BLUEPRINTS
+        }
+        self.assertEqual(endpoints, set(QUERY_BUDGETS))
+        self.assertEqual(endpoints, set(REDIS_BUDGETS))
+        self.assertEqual(endpoints, set(self.requests()))
+
+    def assert_within_budget(self, endpoints):
+        # Подписки воркера на отзыв токенов и соединения Redis создаются до подсчета
+        self.client.get("/api/admin/permission/", headers={"Authorization": "JWT " + self.admin_token})
+        redis.ping()
+        requests = self.requests()
+        for endpoint in endpoints:
+            method, url, kwargs = requests[endpoint]
+            with self.subTest(endpoint=endpoint):
+                with app.app_context():
+                    permission_cache.role_permissions(())
+                token_denylist.is_denied({"jti": "warm-up"})
+                headers = {"X-Request-Id": self.prefix, "User-Agent": "budget", **kwargs.pop("headers", {})}
+                with count_queries() as statements, count_redis_round_trips() as commands:
+                    start = perf_counter()
+                    response = self.client.open(url, method=method, headers=headers, **kwargs)
+                    response.get_data()
+                    latency = perf_counter() - start
+                response.close()
+                self.assertLess(response.status_code, 400, response.data)
+                self.assertLessEqual(len(statements), QUERY_BUDGETS[endpoint], statements)
+                self.assertLessEqual(len(commands), REDIS_BUDGETS[endpoint], commands)
+                self.assertLess(latency, LATENCY_BUDGET)
+
+    def test_admin_endpoints_within_budget(self):
+        self.assert_within_budget(endpoint for endpoint in QUERY_BUDGETS if endpoint.startswith("admin_"))
+
+    def test_endpoints_within_budget(self):
+        self.assert_within_budget(endpoint for endpoint in QUERY_BUDGETS if not endpoint.startswith("admin_"))
+
+if __name__ == "__name__":
+    unittest.main()
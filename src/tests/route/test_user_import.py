@@ -0,0 +1,104 @@
+"""Unittest"""
+
+import json
+import secrets
+import unittest
+import uuid
+from unittest import mock
+
+from app import app
+from core.db import db
+from core.hashing import hash_password
+from core.history_writer import history_writer
+from core.settings import settings
+from models.db_models import User
+
+from .fixtures import superuser_token
+
+
+class TestUserImport(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.prefix = f"import-{secrets.token_hex(4)}"
+        self.token = superuser_token()
+
+    def tearDown(self):
+        history_writer.drain()
+        with app.app_context():
+            for user in User.query.filter(User.login.startswith(self.prefix)).all():
+                user.roles = []
+                db.session.delete(user)
+            db.session.commit()
+
+    def test_ndjson_import(self):
+        rows = [
+            {"login": f"{self.prefix}-plain", "password": "secret1", "roles": ["superuser"]},
+            {"login": f"{self.prefix}-hashed", "password_hash": hash_password("secret2")},
+            {"login": f"{self.prefix}-plain", "password": "secret3"},
+            {"login": f"{self.prefix}-role", "roles": ["missing"]},
+        ]
+        body = "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+        response = self.client.post(
+            "/api/admin/user/import",
+            data=body,
+            content_type="application/x-ndjson",
+            headers={"Authorization": "JWT " + self.token},
+        )
+        self.assertEqual(response.status_code, 200)
+        events = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual({event["row"] for event in events if "error" in event}, {3, 4, 5})
+        self.assertEqual(events[-1], {"done": True, "processed": 5, "imported": 2, "failed": 3})
+        for login, password in ((f"{self.prefix}-plain", "secret1"), (f"{self.prefix}-hashed", "secret2")):
+            response = self.client.post(
+                "/api/users/login",
+                data=json.dumps(dict(login=login, password=password)),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 201)
+        with app.app_context():
+            user = User.query.filter_by(login=f"{self.prefix}-plain").first()
+            self.assertEqual([role.name for role in user.roles], ["superuser"])
+
+    def post(self, rows: list[dict]) -> list[dict]:
+        response = self.client.post(
+            "/api/admin/user/import",
+            data="\n".join(json.dumps(row) for row in rows),
+            content_type="application/x-ndjson",
+            headers={"Authorization": "JWT " + self.token},
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def test_duplicates_in_batch(self):
+        user_id = str(uuid.uuid4())
+        events = self.post(
+            [
+                {"id": user_id, "login": f"{self.prefix}-first"},
+                {"id": user_id, "login": f"{self.prefix}-second", "roles": ["superuser"]},
+            ]
+        )
+        errors = [(event["row"], event["login"]) for event in events if "error" in event]
+        self.assertEqual(errors, [(2, f"{self.prefix}-second")])
+        self.assertEqual(events[-1], {"done": True, "processed": 2, "imported": 1, "failed": 1})
+        with app.app_context():
+            user = User.query.filter_by(id=user_id).one()
+            self.assertEqual((user.login, user.roles), (f"{self.prefix}-first", []))
+
+    def test_failure_is_reported(self):
+        app_settings = settings.app.copy()
+        settings.app.import_batch_size = 1
+        try:
+            with mock.patch("core.user_import.hash_password", side_effect=RuntimeError("hashing failed")):
+                events = self.post(
+                    [{"login": f"{self.prefix}-unusable"}, {"login": f"{self.prefix}-plain", "password": "secret1"}]
+                )
+        finally:
+            settings.app = app_settings
+        self.assertEqual(events[-1], {"error": "Import interrupted", "processed": 1, "imported": 1, "failed": 0})
+        with app.app_context():
+            self.assertEqual(User.query.filter(User.login.startswith(self.prefix)).count(), 1)
+
+
+
+if __name__ == "__name__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Unittest"""
+
+import secrets
+import unittest
+
+from app import app
+from core.db import db
+from core.history_writer import history_writer
+from models.db_models import Role, User
+
+from .fixtures import superuser_token
+
+
+class TestUserRoles(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.logins = [f"roles-{secrets.token_hex(4)}" for _ in range(2)]
+        self.token = superuser_token()
+        with app.app_context():
+            self.role_id = str(Role.query.filter_by(name="superuser").one().id)
+            users = [User(login=login, password="!") for login in self.logins]
+            db.session.add_all(users)
+            db.session.commit()
+            self.user_ids = [str(user.id) for user in users]
+
+    def tearDown(self):
+        history_writer.drain()
+        with app.app_context():
+            for user in User.query.filter(User.login.in_(self.logins)).all():
+                user.roles = []
+                db.session.delete(user)
+            db.session.commit()
+
+    def role_names(self, user_id):
+        with app.app_context():
+            return [role.name for role in User.query.filter_by(id=user_id).one().roles]
+
+    def test_role_update(self):
+        headers = {"Authorization": "JWT " + self.token}
+        response = self.client.put(f"/api/admin/user/{self.user_ids[0]}/role/", json=[self.role_id], headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.role_names(self.user_ids[0]), ["superuser"])
+
+        response = self.client.put(
+            "/api/admin/user/roles/", json={"users": self.user_ids, "roles": [self.role_id]}, headers=headers
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json["inserted"], response.json["deleted"]), (1, 0))
+        self.assertEqual(self.role_names(self.user_ids[1]), ["superuser"])
+
+        response = self.client.put("/api/admin/user/roles/", json={"users": self.user_ids, "roles": []}, headers=headers)
+        self.assertEqual((response.json["inserted"], response.json["deleted"]), (0, 2))
+        self.assertEqual(self.role_names(self.user_ids[0]), [])
+
+        response = self.client.put(
+            f"/api/admin/user/{self.user_ids[0]}/role/", json=[self.user_ids[1]], headers=headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__name__":
+    unittest.main()
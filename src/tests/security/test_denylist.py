@@ -0,0 +1,72 @@
+"""Unittest"""
+
+import secrets
+import time
+import unittest
+
+from app import app
+from core.denylist import DENIED_KEY, BloomFilter, TokenDenylist
+from core.redis import redis
+from core.tokens import ACCESS_TOKEN_TTL, tokens
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_added_items_are_found(self):
+        bloom = BloomFilter(1 << 16, 7)
+        items = [secrets.token_urlsafe(12) for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(secrets.token_urlsafe(12) in bloom for _ in range(1000))
+        self.assertLess(false_positives, 10)
+
+
+class TestTokenDenylist(unittest.TestCase):
+    @staticmethod
+    def claims(sid: str = None) -> dict:
+        return tokens.decode(tokens.issue(secrets.token_hex(16), None, ACCESS_TOKEN_TTL, sid=sid))
+
+    @staticmethod
+    def wait_until_denied(denylist: TokenDenylist, claims: dict) -> bool:
+        deadline = time.monotonic() + 2
+        while not denylist.is_denied(claims) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return denylist.is_denied(claims)
+
+    def test_denied_token_and_session(self):
+        denylist = TokenDenylist()
+        sid, other_sid = secrets.token_urlsafe(8), secrets.token_urlsafe(8)
+        token, same_session, other_session = self.claims(sid), self.claims(sid), self.claims(other_sid)
+        without_session = self.claims()
+        self.assertFalse(denylist.is_denied(token))
+
+        # Отзыв из другого воркера доходит через канал
+        TokenDenylist().deny(token)
+        TokenDenylist().deny(without_session)
+        self.assertTrue(self.wait_until_denied(denylist, token))
+        self.assertTrue(self.wait_until_denied(denylist, without_session))
+        self.assertTrue(denylist.is_denied(same_session))
+        self.assertFalse(denylist.is_denied(other_session))
+        TokenDenylist().deny_sessions([other_sid])
+        self.assertTrue(self.wait_until_denied(denylist, other_session))
+
+        # Новый воркер загружает отзывы из Redis
+        self.assertTrue(TokenDenylist().is_denied(same_session))
+
+    def test_expired_entries_are_trimmed(self):
+        expired, active = f"jti:{secrets.token_urlsafe(12)}", f"jti:{secrets.token_urlsafe(12)}"
+        redis.zadd(DENIED_KEY, {expired: time.time() - 1, active: time.time() + 60})
+        try:
+            # Список загружается при старте приложения, до первой проверки
+            denylist = TokenDenylist()
+            denylist.init_app(app)
+            self.assertIsNotNone(denylist._filter)
+            self.assertIsNone(redis.zscore(DENIED_KEY, expired))
+            self.assertIn(active, denylist._filter)
+            self.assertTrue(denylist.is_denied({"jti": active.removeprefix("jti:")}))
+        finally:
+            redis.zrem(DENIED_KEY, expired, active)
+
+
+if __name__ == "__name__":
+    unittest.main()
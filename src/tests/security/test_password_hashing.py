@@ -0,0 +1,63 @@
+"""Unittest"""
+
+import unittest
+
+from core.hashing import hash_password, identify_hasher, verify_password
+from core.settings import settings
+
+# pbkdf2.crypt("password", "abcdefghijklmnopqrst", iterations=1000) в формате без маркера версии
+LEGACY_HASH = "abcdefghijklmnopqrstdN6I7gZ2BbTe.Junl/QJGSEoCI3lkTC2"
+
+
+class TestPasswordHashing(unittest.TestCase):
+    def setUp(self):
+        self.app_settings = settings.app.copy()
+        settings.app.salt_length = 20
+        settings.app.psw_hash_iterations = 1000
+        settings.app.legacy_psw_hash_iterations = 1000
+        settings.app.password_scheme = "pbkdf2-sha256"
+
+    def tearDown(self):
+        settings.app = self.app_settings
+
+    def test_legacy_hash_is_verified_and_upgraded(self):
+        self.assertEqual(identify_hasher(LEGACY_HASH).scheme, "p5k2")
+        self.assertEqual(verify_password("password", LEGACY_HASH), (True, True))
+        self.assertEqual(verify_password("wrong", LEGACY_HASH), (False, False))
+
+    def test_legacy_hash_survives_iteration_increase(self):
+        settings.app.psw_hash_iterations = 100000
+        self.assertEqual(verify_password("password", LEGACY_HASH), (True, True))
+
+    def test_current_hash_is_not_upgraded(self):
+        encoded = hash_password("password")
+        self.assertTrue(encoded.startswith("$pbkdf2-sha256$i=1000$"))
+        self.assertEqual(verify_password("password", encoded), (True, False))
+        self.assertEqual(verify_password("wrong", encoded), (False, False))
+
+    def test_changed_parameters_trigger_upgrade(self):
+        encoded = hash_password("password")
+        settings.app.psw_hash_iterations = 2000
+        self.assertEqual(verify_password("password", encoded), (True, True))
+        settings.app.password_scheme = "scrypt"
+        scrypt_encoded = hash_password("password")
+        self.assertTrue(scrypt_encoded.startswith("$scrypt$"))
+        self.assertEqual(verify_password("password", scrypt_encoded), (True, False))
+
+    def test_malformed_hash_is_rejected(self):
+        # Для значений, не являющихся хешем, KDF не считается
+        for stored in ("", "!", "short"):
+            self.assertIsNone(identify_hasher(stored))
+        encoded = hash_password("password")
+        for stored in (
+            encoded.rsplit("$", 1)[0],
+            encoded.replace("i=1000", "i=many"),
+            "$scrypt$n=2$c2FsdA$ZGlnZXN0",
+            encoded[:-1] + "*",
+        ):
+            with self.subTest(stored=stored):
+                self.assertEqual(verify_password("password", stored), (False, False))
+
+
+if __name__ == "__name__":
+    unittest.main()
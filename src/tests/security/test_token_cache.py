@@ -0,0 +1,66 @@
+"""Unittest"""
+
+import time
+import unittest
+import uuid
+
+import jwt
+
+from app import app
+from core.denylist import token_denylist
+from core.login_manager import decode_token
+from core.settings import settings
+from core.token_cache import VerifiedTokenCache, token_cache
+from core.tokens import ACCESS_TOKEN_TTL, tokens
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.app_settings = settings.app.copy()
+        self.cache = VerifiedTokenCache()
+        self.user_id = uuid.uuid4()
+        self.decoded = []
+
+    def tearDown(self):
+        settings.app = self.app_settings
+
+    def decode(self, token: str) -> dict:
+        self.decoded.append(token)
+        return tokens.decode(token)
+
+    def test_repeated_token_is_verified_once(self):
+        token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL, sid="first")
+        claims = self.cache.decode(token, self.decode)
+        self.assertEqual(self.cache.decode(token, self.decode), claims)
+        self.assertEqual(self.decoded, [token])
+
+    def test_cache_is_bounded(self):
+        settings.app.token_cache_size = 2
+        issued = [tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL, sid=str(number)) for number in range(3)]
+        for token in issued:
+            self.cache.decode(token, self.decode)
+        self.cache.decode(issued[0], self.decode)
+        self.assertEqual(self.decoded, [*issued, issued[0]])
+
+    def test_revoked_cached_token_is_rejected(self):
+        session_token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL, sid=uuid.uuid4().hex)
+        other_token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL, sid=uuid.uuid4().hex)
+        claims = decode_token(session_token)
+        decode_token(other_token)
+        self.assertIs(token_cache.decode(session_token, self.decode), claims)
+        token_denylist.deny(claims)
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            try:
+                decode_token(session_token)
+            except jwt.InvalidTokenError:
+                break
+            time.sleep(0.05)
+        else:
+            self.fail("отозванный токен принят")
+        self.assertEqual(decode_token(other_token), tokens.decode(other_token))
+        self.assertEqual(self.decoded, [])
+
+
+if __name__ == "__name__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Unittest"""
+
+import base64
+import binascii
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+
+from app import app
+from core.settings import settings
+from core.tokens import ACCESS_TOKEN, ACCESS_TOKEN_TTL, REFRESH_TOKEN, REFRESH_TOKEN_TTL, tokens
+
+
+def write_key(key_dir: str, kid: str, private_key, public_only: bool = False) -> None:
+    if public_only:
+        data = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    else:
+        data = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+    Path(key_dir, f"{kid}.pem").write_bytes(data)
+
+
+def b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def b64int(value: str) -> int:
+    return int.from_bytes(b64decode(value), "big")
+
+
+class TestTokenService(unittest.TestCase):
+    def setUp(self):
+        self.app_settings = settings.app.copy()
+        self.user_id = uuid.uuid4()
+
+    def tearDown(self):
+        settings.app = self.app_settings
+
+    def decode(self, token: str) -> dict:
+        return jwt.decode(token, key=base64.b64decode(settings.app.jwt_secret_key), algorithms=["HS256"])
+
+    def test_pair_is_readable_by_pyjwt(self):
+        pair = tokens.issue_pair(self.user_id, None, login="user", sid="sid")
+        access, refresh = self.decode(pair["access_token"]), self.decode(pair["refresh_token"])
+        self.assertEqual(access["sub"], f'"{self.user_id.hex}"')
+        self.assertEqual(access["role"], "user")
+        self.assertNotIn("permissions", access)
+        self.assertEqual(access["sid"], "sid")
+        self.assertEqual(access["iat"], refresh["iat"])
+        self.assertEqual(access["exp"] - access["iat"], ACCESS_TOKEN_TTL.total_seconds())
+        self.assertEqual(refresh["exp"] - refresh["iat"], REFRESH_TOKEN_TTL.total_seconds())
+        self.assertEqual(tokens.decode(pair["access_token"]), access)
+        self.assertEqual((access["typ"], refresh["typ"]), (ACCESS_TOKEN, REFRESH_TOKEN))
+        self.assertEqual(tokens.decode(pair["refresh_token"], REFRESH_TOKEN), refresh)
+        with self.assertRaises(jwt.InvalidTokenError):
+            tokens.decode(pair["refresh_token"])
+        with self.assertRaises(jwt.InvalidTokenError):
+            tokens.decode(pair["access_token"], REFRESH_TOKEN)
+
+    def test_secret_change_is_applied(self):
+        token = tokens.issue(self.user_id, "admin", ACCESS_TOKEN_TTL)
+        settings.app.jwt_secret_key = base64.b64encode(b"another secret").decode()
+        with self.assertRaises(jwt.DecodeError):
+            tokens.decode(token)
+        self.assertEqual(self.decode(tokens.issue(self.user_id, "admin", ACCESS_TOKEN_TTL))["role"], "admin")
+
+    def test_errors_are_raised(self):
+        settings.app.jwt_secret_key = "not base64!"
+        with self.assertRaises(binascii.Error):
+            tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL)
+        settings.app.jwt_secret_key = self.app_settings.jwt_secret_key
+        with self.assertRaises(ValueError):
+            tokens.issue("not a uuid", None, ACCESS_TOKEN_TTL)
+
+
+class TestAsymmetricTokens(unittest.TestCase):
+    def setUp(self):
+        self.app_settings = settings.app.copy()
+        self.key_dir = tempfile.TemporaryDirectory()
+        self.rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.ed_key = ed25519.Ed25519PrivateKey.generate()
+        write_key(self.key_dir.name, "rsa-1", self.rsa_key)
+        write_key(self.key_dir.name, "ed-1", self.ed_key)
+        settings.app.jwt_key_dir = self.key_dir.name
+        self.user_id = uuid.uuid4()
+
+    def tearDown(self):
+        settings.app = self.app_settings
+        self.key_dir.cleanup()
+
+    def test_rs256_token_is_verified_with_jwks(self):
+        settings.app.jwt_kid = "rsa-1"
+        token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL)
+        self.assertEqual(jwt.get_unverified_header(token), {"typ": "JWT", "alg": "RS256", "kid": "rsa-1"})
+        jwk = {key["kid"]: key for key in tokens.jwks()["keys"]}["rsa-1"]
+        # Другой сервис проверяет подпись только по JWKS
+        public_key = rsa.RSAPublicNumbers(b64int(jwk["e"]), b64int(jwk["n"])).public_key()
+        header, payload, signature = token.split(".")
+        public_key.verify(
+            b64decode(signature), f"{header}.{payload}".encode(), padding.PKCS1v15(), hashes.SHA256()
+        )
+        self.assertEqual(tokens.decode(token)["sub"], f'"{self.user_id.hex}"')
+
+    def test_eddsa_token_and_rotation(self):
+        settings.app.jwt_kid = "ed-1"
+        old_token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL)
+        self.assertEqual(jwt.get_unverified_header(old_token)["alg"], "EdDSA")
+        jwk = {key["kid"]: key for key in tokens.jwks()["keys"]}["ed-1"]
+        self.assertEqual((jwk["kty"], jwk["crv"]), ("OKP", "Ed25519"))
+
+        # Ротация: новый ключ подписи, старый остается только открытым
+        write_key(self.key_dir.name, "ed-1", self.ed_key, public_only=True)
+        write_key(self.key_dir.name, "ed-2", ed25519.Ed25519PrivateKey.generate())
+        settings.app.jwt_kid = "ed-2"
+        new_token = tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL)
+        self.assertEqual(jwt.get_unverified_header(new_token)["kid"], "ed-2")
+        self.assertEqual(tokens.decode(old_token)["sub"], tokens.decode(new_token)["sub"])
+
+        settings.app.jwt_kid = "ed-1"
+        with self.assertRaises(ValueError):
+            tokens.issue(self.user_id, None, ACCESS_TOKEN_TTL)
+        settings.app.jwt_kid = ""
+        settings.app.jwt_key_dir = ""
+        with self.assertRaises(jwt.InvalidTokenError):
+            tokens.decode(new_token)
+
+    def test_jwks_endpoint_is_cacheable(self):
+        client = app.test_client()
+        response = client.get("/.well-known/jwks.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({key["kid"] for key in response.json["keys"]}, {"rsa-1", "ed-1"})
+        self.assertTrue(response.cache_control.public)
+        self.assertEqual(response.cache_control.max_age, settings.app.jwks_max_age)
+        response = client.get("/.well-known/jwks.json", headers={"If-None-Match": response.get_etag()[0]})
+        self.assertEqual(response.status_code, 304)
+
+
+if __name__ == "__name__":
+    unittest.main()